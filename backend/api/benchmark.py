@@ -0,0 +1,293 @@
+import io
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import override_settings
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+from .metrics import percentile
+from .testing import QueryBudgetExceeded, assert_max_queries
+
+Scenario = namedtuple('Scenario', ('name', 'url', 'authenticated', 'budget'))
+
+CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'benchmark-{alias}',
+    }
+    for alias in ('default', 'responses', 'generations')
+}
+
+SCENARIOS = (
+    Scenario('recipes-list', '/api/recipes/?limit=6', False, 6),
+    Scenario('recipes-list-auth', '/api/recipes/?limit=6', True, 6),
+    Scenario('recipes-page-100', '/api/recipes/?limit=100', False, 6),
+    Scenario('recipes-page-100-auth', '/api/recipes/?limit=100', True, 6),
+    Scenario('recipes-list-deep', '/api/recipes/?limit=6&page={deep_page}',
+             False, 6),
+    Scenario('recipes-cursor', '/api/recipes/?limit=6&cursor=', False, 6),
+    Scenario('recipes-popular',
+             '/api/recipes/?limit=6&ordering=-favorites_count', False, 6),
+    Scenario('recipes-tags', '/api/recipes/?limit=6&tags=tag0&tags=tag1',
+             False, 6),
+    Scenario('recipes-favorited', '/api/recipes/?limit=6&is_favorited=1',
+             True, 6),
+    Scenario('recipes-trending', '/api/recipes/trending/?limit=6', False, 6),
+    Scenario('recipes-detail', '/api/recipes/{recipe_id}/', True, 6),
+    Scenario('subscriptions', '/api/users/subscriptions/?recipes_limit=3',
+             True, 4),
+    Scenario('ingredients-search', '/api/ingredients/?name=ingredient 1',
+             False, 1),
+    Scenario('download-shopping-cart',
+             '/api/recipes/download_shopping_cart/', True, 2),
+)
+
+
+def zipf_weights(size, exponent):
+    """Веса распределения Ципфа: первые элементы намного популярнее."""
+
+    return [1 / rank ** exponent for rank in range(1, size + 1)]
+
+
+def skewed_sample(population, weights, size, rng):
+    """Выборка без повторов с вероятностями по весам."""
+
+    size = min(size, len(population))
+    chosen = set()
+    while len(chosen) < size:
+        chosen.update(rng.choices(population, weights, k=size - len(chosen)))
+    return list(chosen)
+
+
+def generate_data(users=100, recipes=1000, ingredients_per_recipe=8,
+                  ingredients=2000, favorites=20, carts=5, follows=10,
+                  skew=1.1, seed=0, batch_size=None):
+    """Синтетические данные с перекосом популярности.
+
+    Авторы, рецепты и ингредиенты выбираются по распределению Ципфа с
+    показателем skew, favorites, carts и follows - средние значения на
+    пользователя. Рассчитано на пустую базу.
+    """
+
+    rng = random.Random(seed)
+    Tag.objects.bulk_create(
+        Tag(name=f'Tag {number}', slug=f'tag{number}',
+            color=f'#{number * 40:02X}0000')
+        for number in range(5)
+    )
+    Ingredient.objects.bulk_create(
+        (Ingredient(name=f'ingredient {number}', measurement_unit='г')
+         for number in range(ingredients)), batch_size=batch_size
+    )
+    password = make_password(None)
+    User.objects.bulk_create(
+        (User(username=f'user{number}', email=f'user{number}@example.com',
+              first_name='Bench', last_name=str(number), password=password)
+         for number in range(users)), batch_size=batch_size
+    )
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    ingredient_ids = list(
+        Ingredient.objects.order_by('id').values_list('id', flat=True)
+    )
+    author_weights = zipf_weights(len(user_ids), skew)
+    Recipe.objects.bulk_create(
+        (Recipe(author_id=author_id, name=f'Recipe {number}',
+                text='Benchmark recipe', cooking_time=rng.randint(5, 120),
+                image='recipes/benchmark.jpg')
+         for number, author_id in enumerate(
+             rng.choices(user_ids, author_weights, k=recipes))),
+        batch_size=batch_size
+    )
+    recipe_ids = list(
+        Recipe.objects.order_by('id').values_list('id', flat=True)
+    )
+    ingredient_weights = zipf_weights(len(ingredient_ids), skew)
+    IngredientInRecipe.objects.bulk_create(
+        (
+            IngredientInRecipe(
+                recipe_id=recipe_id, ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500)
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in skewed_sample(
+                ingredient_ids, ingredient_weights, ingredients_per_recipe,
+                rng
+            )
+        ),
+        batch_size=batch_size
+    )
+    Recipe.tags.through.objects.bulk_create(
+        (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in rng.sample(tag_ids, rng.randint(1, 3))
+        ),
+        batch_size=batch_size
+    )
+    shuffled = recipe_ids[:]
+    rng.shuffle(shuffled)
+    recipe_weights = zipf_weights(len(shuffled), skew)
+    for model, per_user in ((Favorite, favorites), (ShoppingCart, carts)):
+        model.objects.bulk_create(
+            (
+                model(user_id=user_id, recipe_id=recipe_id)
+                for user_id in user_ids
+                for recipe_id in skewed_sample(
+                    shuffled, recipe_weights, rng.randint(0, 2 * per_user),
+                    rng
+                )
+            ),
+            batch_size=batch_size
+        )
+    Follow.objects.bulk_create(
+        (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in skewed_sample(
+                user_ids, author_weights, rng.randint(0, 2 * follows), rng
+            )
+            if author_id != user_id
+        ),
+        batch_size=batch_size
+    )
+    call_command('reconcile_counters', stdout=io.StringIO())
+    call_command('refresh_trending', '--full', stdout=io.StringIO())
+    return {
+        'users': users, 'recipes': recipes,
+        'ingredients_per_recipe': ingredients_per_recipe,
+        'ingredients': ingredients, 'favorites': favorites, 'carts': carts,
+        'follows': follows, 'skew': skew, 'seed': seed,
+    }
+
+
+def request(client, url):
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def run_scenario(scenario, client, url, iterations, warmup, cold):
+    """Задержки, число запросов и пик памяти одного сценария.
+
+    Лимит запросов сценария проверяется только с прогретыми кэшами.
+    """
+
+    def clear():
+        if cold:
+            caches['default'].clear()
+            caches['responses'].clear()
+
+    for _ in range(warmup):
+        clear()
+        request(client, url)
+    budget = None if cold else scenario.budget
+    timings = []
+    queries = 0
+    budget_exceeded = False
+    for _ in range(iterations):
+        clear()
+        started = time.perf_counter()
+        try:
+            with assert_max_queries(
+                budget or sys.maxsize, connection
+            ) as context:
+                response = request(client, url)
+        except QueryBudgetExceeded:
+            budget_exceeded = True
+        timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(context.captured_queries))
+    clear()
+    tracemalloc.start()
+    request(client, url)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'url': url,
+        'status': response.status_code,
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': queries,
+        'budget': budget,
+        'budget_exceeded': budget_exceeded,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def get_clients():
+    """Клиенты анонимного и авторизованного пользователя и параметры."""
+
+    user_id = (
+        ShoppingCart.objects.order_by('user_id').values_list(
+            'user_id', flat=True
+        ).first()
+        or User.objects.order_by('id').values_list('id', flat=True).first()
+    )
+    user = User.objects.get(pk=user_id)
+    anonymous = APIClient()
+    authenticated = APIClient()
+    authenticated.force_authenticate(user)
+    params = {
+        'deep_page': max(Recipe.objects.count() // 6 - 1, 1),
+        'recipe_id': Recipe.objects.values_list('id', flat=True).first(),
+    }
+    return anonymous, authenticated, params
+
+
+def run_benchmark(iterations=50, warmup=5, cold=False, only=None):
+    """Прогнать сценарии SCENARIOS на тестовом клиенте."""
+
+    anonymous, authenticated, params = get_clients()
+    results = {}
+    for scenario in SCENARIOS:
+        if only and scenario.name not in only:
+            continue
+        client = authenticated if scenario.authenticated else anonymous
+        results[scenario.name] = run_scenario(
+            scenario, client, scenario.url.format(**params),
+            iterations, warmup, cold
+        )
+    return results
+
+
+def check_parity(only=None):
+    """Сценарии, где быстрый сериализатор списка рецептов и DRF
+    отвечают по-разному.
+
+    Оба ответа получаются с очищенными кэшами и сравниваются после
+    разбора JSON.
+    """
+
+    anonymous, authenticated, params = get_clients()
+    mismatches = []
+    for scenario in SCENARIOS:
+        if only and scenario.name not in only:
+            continue
+        client = authenticated if scenario.authenticated else anonymous
+        url = scenario.url.format(**params)
+        responses = []
+        for fast in (False, True):
+            caches['default'].clear()
+            caches['responses'].clear()
+            with override_settings(RECIPE_FAST_SERIALIZER=fast):
+                response = request(client, url)
+            if response['Content-Type'] != 'application/json':
+                break
+            responses.append(response.json())
+        else:
+            if responses[0] != responses[1]:
+                mismatches.append(scenario.name)
+    return mismatches
@@ -0,0 +1,153 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.db.models import Sum
+from recipes.models import Favorite, IngredientInRecipe, ShoppingCart, Tag
+
+GENERATION_KEY = 'generation:{}'
+MEMBERSHIP_KEY = 'membership:{}:{}:{}'
+SHOPPING_CART_KEY = 'shopping_cart:{}:{}:{}:{}'
+TAG_MAP_KEY = 'tag_map:{}'
+
+
+def _now():
+    return int(time.time() * 1000000)
+
+
+def _generations():
+    return caches['generations']
+
+
+def get_generation(scope):
+    """Текущее поколение данных области scope.
+
+    Поколение - метка времени последнего изменения в микросекундах.
+    Поколения хранятся в отдельном кэше 'generations', чтобы отсев
+    записей основного кэша их не вытеснял. Если в кэше поколения нет,
+    оно начинается заново с текущего момента, что сбрасывает все
+    зависящие от него ключи.
+    """
+
+    generations = _generations()
+    key = GENERATION_KEY.format(scope)
+    generation = generations.get(key)
+    if generation is None:
+        generation = _now()
+        if not generations.add(key, generation, None):
+            generation = generations.get(key, generation)
+    return generation
+
+
+def get_generations(scopes):
+    """Поколения нескольких областей одним обращением к кэшу."""
+
+    keys = {GENERATION_KEY.format(scope): scope for scope in scopes}
+    found = _generations().get_many(keys)
+    return [
+        found[key] if key in found else get_generation(scope)
+        for key, scope in keys.items()
+    ]
+
+
+def bump_generation(scope):
+    """Отметить изменение данных области scope."""
+
+    generations = _generations()
+    key = GENERATION_KEY.format(scope)
+    generation = max(_now(), generations.get(key, 0) + 1)
+    generations.set(key, generation, None)
+    return generation
+
+
+def bump_generation_on_commit(scope):
+    """Отметить изменение после фиксации текущей транзакции."""
+
+    transaction.on_commit(lambda: bump_generation(scope))
+
+
+def get_tag_map():
+    """Словарь слаг тега -> id, хранимый в кэше до изменения тегов."""
+
+    key = TAG_MAP_KEY.format(get_generation('tags'))
+    tag_map = cache.get(key)
+    if tag_map is None:
+        tag_map = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_map, settings.TAG_MAP_CACHE_TIMEOUT)
+    return tag_map
+
+
+def iter_shopping_cart(user):
+    """Суммарный список ингредиентов из списка покупок пользователя.
+
+    Строки читаются курсором и параллельно сохраняются в кэш, поэтому
+    повторное скачивание не выполняет агрегирующий запрос, пока не
+    изменятся список покупок пользователя, рецепты или ингредиенты.
+    """
+
+    key = SHOPPING_CART_KEY.format(
+        user.id,
+        get_generation(f'shopping_cart:{user.id}'),
+        get_generation('recipes'),
+        get_generation('ingredients'),
+    )
+    rows = cache.get(key)
+    if rows is not None:
+        yield from rows
+        return
+    rows = []
+    ingredients = IngredientInRecipe.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).order_by(
+        'ingredient__name'
+    ).annotate(ingredient_total=Sum('amount'))
+    for row in ingredients.iterator():
+        rows.append(row)
+        yield row
+    cache.set(key, rows, settings.SHOPPING_CART_CACHE_TIMEOUT)
+
+
+def _membership_key(model, user_id):
+    return MEMBERSHIP_KEY.format(
+        model._meta.model_name, user_id, get_generation(f'user:{user_id}')
+    )
+
+
+def get_membership(request, model):
+    """Множество id рецептов пользователя из Favorite или ShoppingCart.
+
+    Множество загружается одним запросом, хранится в общем кэше и
+    запоминается на объекте запроса. Ключ включает поколение
+    'user:<id>', которое после фиксации любого изменения избранного,
+    покупок или подписок меняет приемник user_state_changed, поэтому
+    множество, прочитанное до изменения, не будет найдено.
+    """
+
+    if request is None or request.user.is_anonymous:
+        return frozenset()
+    memberships = request.__dict__.setdefault('_memberships', {})
+    if model not in memberships:
+        user_id = request.user.id
+        key = _membership_key(model, user_id)
+        recipes = cache.get(key)
+        if recipes is None:
+            recipes = frozenset(
+                model.objects.filter(
+                    user_id=user_id
+                ).values_list('recipe_id', flat=True)
+            )
+            cache.set(key, recipes, settings.MEMBERSHIP_CACHE_TIMEOUT)
+        memberships[model] = recipes
+    return memberships[model]
+
+
+def invalidate_membership(user_id):
+    """Удалить множества рецептов пользователя после фиксации."""
+
+    keys = [
+        _membership_key(model, user_id) for model in (Favorite, ShoppingCart)
+    ]
+    transaction.on_commit(lambda: cache.delete_many(keys))
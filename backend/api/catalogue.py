@@ -0,0 +1,88 @@
+from threading import Lock
+
+from recipes.models import Ingredient, Tag
+
+from .cache import get_generation
+from .compression import compress, compressed_response
+from .renderers import FastJSONRenderer
+from .serializers import IngredientSerializer, TagSerializer
+
+
+class Catalogue:
+    """Готовый JSON справочника в памяти процесса.
+
+    Хранит ответ со всем списком, в том числе сжатый, и ответы для
+    отдельных объектов.
+    Пересобирается, когда меняется поколение scope в общем кэше,
+    поэтому изменения видят все процессы.
+    """
+
+    def __init__(self, queryset, serializer_class, scope):
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.scope = scope
+        self.version = None
+        self.content = None
+        self.items = {}
+        self.lock = Lock()
+
+    def load(self):
+        version = get_generation(self.scope)
+        if self.version != version:
+            with self.lock:
+                if self.version != version:
+                    self.build(version)
+        return self.content, self.items
+
+    def build(self, version):
+        renderer = FastJSONRenderer()
+        data = self.serializer_class(self.queryset.all(), many=True).data
+        self.content = compress(renderer.render(data))
+        self.items = {
+            item['id']: compress(renderer.render(item)) for item in data
+        }
+        self.version = version
+
+    def get_list(self):
+        return self.load()[0]
+
+    def get_item(self, pk):
+        return self.load()[1].get(pk)
+
+
+class CatalogueMixin:
+    """list и retrieve из Catalogue без запросов к базе.
+
+    Используется для ответов в JSON без параметров запроса, остальные
+    запросы обрабатываются обычным образом.
+    """
+
+    catalogue = None
+
+    def use_catalogue(self, request):
+        return (
+            self.catalogue is not None
+            and request.accepted_renderer.format == 'json'
+            and not request.query_params
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_catalogue(request):
+            return super().list(request, *args, **kwargs)
+        return compressed_response(request, self.catalogue.get_list())
+
+    def retrieve(self, request, *args, **kwargs):
+        if self.use_catalogue(request):
+            try:
+                content = self.catalogue.get_item(int(kwargs['pk']))
+            except (TypeError, ValueError):
+                content = None
+            if content is not None:
+                return compressed_response(request, content)
+        return super().retrieve(request, *args, **kwargs)
+
+
+tag_catalogue = Catalogue(Tag.objects.all(), TagSerializer, 'tags')
+ingredient_catalogue = Catalogue(
+    Ingredient.objects.all(), IngredientSerializer, 'ingredients'
+)
@@ -0,0 +1,55 @@
+import gzip
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def compress(content):
+    """Тело ответа без сжатия и сжатое gzip и brotli.
+
+    Тела меньше COMPRESS_MIN_SIZE байт не сжимаются.
+    """
+
+    variants = {'identity': content}
+    if len(content) < settings.COMPRESS_MIN_SIZE:
+        return variants
+    variants['gzip'] = gzip.compress(content, compresslevel=6)
+    if brotli is not None:
+        variants['br'] = brotli.compress(content, quality=5)
+    return variants
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        encoding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00'):
+            encodings.add(encoding.strip().lower())
+    return encodings
+
+
+def compressed_response(request, variants,
+                        content_type='application/json'):
+    """Ответ с лучшим вариантом тела, который принимает клиент."""
+
+    encodings = accepted_encodings(request)
+    for encoding in ('br', 'gzip'):
+        if encoding in variants and encoding in encodings:
+            response = HttpResponse(
+                variants[encoding], content_type=content_type
+            )
+            response['Content-Encoding'] = encoding
+            break
+    else:
+        response = HttpResponse(
+            variants['identity'], content_type=content_type
+        )
+    if len(variants) > 1:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
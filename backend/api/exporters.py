@@ -0,0 +1,113 @@
+import csv
+import io
+import os
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+FOOTER = 'FoodGram Service'
+
+
+def format_line(row):
+    return (f'{row["ingredient__name"]} '
+            f'({row["ingredient__measurement_unit"]}) - '
+            f'{row["ingredient_total"]}')
+
+
+class TxtExporter:
+    """Список покупок в виде текстового файла."""
+
+    extension = 'txt'
+    content_type = 'text/plain; charset=utf-8'
+
+    def render(self, rows):
+        for row in rows:
+            yield f'{format_line(row)}\n'.encode()
+        yield f'\n{FOOTER}'.encode()
+
+
+class _Echo:
+    """Псевдофайл, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class CsvExporter:
+    """Список покупок в формате CSV."""
+
+    extension = 'csv'
+    content_type = 'text/csv; charset=utf-8'
+    header = ('Ингредиент', 'Единица измерения', 'Количество')
+
+    def render(self, rows):
+        writer = csv.writer(_Echo())
+        yield '\ufeff'.encode()
+        yield writer.writerow(self.header).encode()
+        for row in rows:
+            yield writer.writerow((
+                row['ingredient__name'],
+                row['ingredient__measurement_unit'],
+                row['ingredient_total'],
+            )).encode()
+
+
+class PdfExporter:
+    """Список покупок в формате PDF.
+
+    Страницы формата A4 отрисовываются средствами Pillow шрифтом из
+    SHOPPING_CART_PDF_FONT, внешние сервисы не нужны.
+    """
+
+    extension = 'pdf'
+    content_type = 'application/pdf'
+    resolution = 150
+    page_size = (1240, 1754)
+    margin = 100
+    font_size = 28
+    line_height = 40
+
+    def get_font(self):
+        font_path = settings.SHOPPING_CART_PDF_FONT
+        if font_path and os.path.exists(font_path):
+            return ImageFont.truetype(font_path, self.font_size)
+        return ImageFont.load_default()
+
+    def new_page(self):
+        page = Image.new('L', self.page_size, 255)
+        return page, ImageDraw.Draw(page)
+
+    def render_pages(self, rows):
+        font = self.get_font()
+        lines_per_page = (
+            (self.page_size[1] - 2 * self.margin) // self.line_height
+        )
+        lines = [format_line(row) for row in rows]
+        lines.extend(('', FOOTER))
+        pages = []
+        for start in range(0, len(lines), lines_per_page):
+            page, draw = self.new_page()
+            for number, line in enumerate(
+                lines[start:start + lines_per_page]
+            ):
+                draw.text(
+                    (self.margin, self.margin + number * self.line_height),
+                    line, font=font, fill=0
+                )
+            pages.append(page)
+        return pages
+
+    def render(self, rows):
+        pages = self.render_pages(rows)
+        content = io.BytesIO()
+        pages[0].save(
+            content, 'PDF', resolution=self.resolution,
+            save_all=True, append_images=pages[1:]
+        )
+        yield content.getvalue()
+
+
+EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (TxtExporter, CsvExporter, PdfExporter)
+}
@@ -0,0 +1,131 @@
+import binascii
+import uuid
+from collections import Counter
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_HEADER = ';base64,'
+DECODE_CHUNK = 64 * 1024
+
+
+class RecipeImageField(serializers.ImageField):
+    """Изображение рецепта строкой base64 или файлом multipart.
+
+    Строка base64 проверяется по длине до декодирования и декодируется
+    по частям во временный файл, который остается в памяти только до
+    IMAGE_UPLOAD_SPOOL_SIZE байт. Размеры изображения проверяются по
+    заголовку, до распаковки пикселей.
+    """
+
+    default_error_messages = {
+        'invalid_image': 'Загрузите корректное изображение.',
+        'invalid_format': 'Допустимые форматы: {formats}.',
+        'too_large': 'Размер файла не должен превышать {max_bytes} байт.',
+        'too_many_pixels': (
+            'Изображение не должно превышать {max_pixels} пикселей.'
+        ),
+    }
+    allowed_formats = ('jpeg', 'png', 'gif', 'webp')
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = self.decode(data)
+        elif not isinstance(data, UploadedFile):
+            self.fail('invalid_image')
+        elif data.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.fail('too_large', max_bytes=settings.IMAGE_UPLOAD_MAX_BYTES)
+        data.name = f'{uuid.uuid4()}.{self.check_image(data)}'
+        return data
+
+    def decode(self, data):
+        start = data.find(BASE64_HEADER)
+        start = 0 if start == -1 else start + len(BASE64_HEADER)
+        encoded_size = len(data) - start
+        size = encoded_size // 4 * 3 - data.count('=', len(data) - 2)
+        if size > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.fail('too_large', max_bytes=settings.IMAGE_UPLOAD_MAX_BYTES)
+        if not encoded_size or encoded_size % 4:
+            self.fail('invalid_image')
+        file = SpooledTemporaryFile(
+            max_size=settings.IMAGE_UPLOAD_SPOOL_SIZE
+        )
+        try:
+            for position in range(start, len(data), DECODE_CHUNK):
+                file.write(binascii.a2b_base64(
+                    data[position:position + DECODE_CHUNK]
+                ))
+        except binascii.Error:
+            file.close()
+            self.fail('invalid_image')
+        size = file.tell()
+        file.seek(0)
+        return UploadedFile(file, name='upload', size=size)
+
+    def check_image(self, file):
+        """Проверить формат и размеры изображения, вернуть расширение."""
+
+        try:
+            image = Image.open(file)
+            image_format = (image.format or '').lower()
+            pixels = image.width * image.height
+            if pixels <= settings.IMAGE_UPLOAD_MAX_PIXELS:
+                image.verify()
+        except (OSError, SyntaxError, ValueError,
+                Image.DecompressionBombError):
+            self.fail('invalid_image')
+        if pixels > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.fail(
+                'too_many_pixels',
+                max_pixels=settings.IMAGE_UPLOAD_MAX_PIXELS
+            )
+        if image_format not in self.allowed_formats:
+            self.fail(
+                'invalid_format', formats=', '.join(self.allowed_formats)
+            )
+        file.seek(0)
+        file.content_type = image.get_format_mimetype()
+        return 'jpg' if image_format == 'jpeg' else image_format
+
+
+def resolve_ids(queryset, ids):
+    """Объекты по списку id одним запросом in_bulk.
+
+    Отсутствующие и повторяющиеся id сообщаются одной ошибкой.
+    """
+
+    objects = queryset.in_bulk(ids)
+    errors = []
+    missing = [pk for pk in dict.fromkeys(ids) if pk not in objects]
+    if missing:
+        errors.append(
+            f'Не найдены объекты с id: {", ".join(map(str, missing))}.'
+        )
+    duplicates = [pk for pk, count in Counter(ids).items() if count > 1]
+    if duplicates:
+        errors.append(
+            f'Повторяющиеся id: {", ".join(map(str, duplicates))}.'
+        )
+    if errors:
+        raise serializers.ValidationError(errors)
+    return objects
+
+
+class BulkPrimaryKeyRelatedField(serializers.ListField):
+    """Список первичных ключей, проверяемый одним запросом."""
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        kwargs['child'] = serializers.IntegerField()
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        ids = super().to_internal_value(data)
+        objects = resolve_ids(self.queryset.all(), ids)
+        return [objects[pk] for pk in ids]
+
+    def to_representation(self, value):
+        return [obj.pk for obj in value.all()]
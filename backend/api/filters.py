@@ -1,29 +1,95 @@
+from django import forms
+from django.db.models import Count
 from django_filters.rest_framework import FilterSet, filters
 from django_filters.widgets import BooleanWidget
-from recipes.models import Ingredient, Recipe
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
 from users.models import User
 
+from .cache import get_membership, get_tag_map
+from .search import ingredient_search
+
+
+class MultipleValueField(forms.Field):
+    """Все значения повторяющегося параметра запроса списком."""
+
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        return [item for item in value or () if item]
+
+
+class MultipleValueFilter(filters.Filter):
+    field_class = MultipleValueField
+
 
 class IngredientFilter(FilterSet):
     """Фильтр для ингридиентов."""
 
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def filter_name(self, queryset, name, value):
+        return ingredient_search.search(queryset, value)
+
 
 class RecipeFilter(FilterSet):
     """Фильтр для рецептов."""
 
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug'
+    tags = MultipleValueFilter(method='filter_tags')
+    tags_match = filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='filter_nothing'
+    )
+    is_favorited = filters.BooleanFilter(
+        method='filter_membership', widget=BooleanWidget()
+    )
+    is_in_shopping_cart = filters.BooleanFilter(
+        method='filter_membership', widget=BooleanWidget()
+    )
+    ordering = filters.OrderingFilter(
+        fields=('pub_date', 'favorites_count', 'in_carts_count')
     )
-    is_favorited = filters.BooleanFilter(widget=BooleanWidget())
-    is_in_shopping_cart = filters.BooleanFilter(widget=BooleanWidget())
+
+    MEMBERSHIP_MODELS = {
+        'is_favorited': Favorite,
+        'is_in_shopping_cart': ShoppingCart,
+    }
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags',
+                  'tags_match')
+
+    def filter_nothing(self, queryset, name, value):
+        return queryset
+
+    def filter_tags(self, queryset, name, value):
+        """Рецепты с любым (tags_match=any) или всеми тегами из списка.
+
+        Слаги переводятся в id по закэшированному словарю тегов, рецепты
+        отбираются подзапросом к таблице связей без JOIN и DISTINCT.
+        """
+
+        tag_map = get_tag_map()
+        tag_ids = {tag_map[slug] for slug in value if slug in tag_map}
+        match_all = self.form.cleaned_data.get('tags_match') == 'all'
+        if not tag_ids or match_all and len(tag_ids) < len(set(value)):
+            return queryset.none()
+        recipes = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+        if match_all:
+            recipes = recipes.values('recipe_id').annotate(
+                matched=Count('tag_id')
+            ).filter(matched=len(tag_ids))
+        return queryset.filter(id__in=recipes.values('recipe_id'))
+
+    def filter_membership(self, queryset, name, value):
+        recipes = list(
+            get_membership(self.request, self.MEMBERSHIP_MODELS[name])
+        )
+        if value:
+            return queryset.filter(id__in=recipes)
+        return queryset.exclude(id__in=recipes)
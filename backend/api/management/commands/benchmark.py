@@ -0,0 +1,126 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment
+from django.utils import timezone
+
+from api.benchmark import (CACHES, SCENARIOS, check_parity, generate_data,
+                           run_benchmark)
+
+
+class Command(BaseCommand):
+    help = ('Benchmark API endpoints on a generated dataset in a test '
+            'database with in-memory caches and write the results as JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=100, type=int)
+        parser.add_argument('--recipes', default=1000, type=int)
+        parser.add_argument('--ingredients-per-recipe', default=8, type=int)
+        parser.add_argument('--ingredients', default=2000, type=int)
+        parser.add_argument('--favorites', default=20, type=int,
+                            help='Average favorites per user')
+        parser.add_argument('--carts', default=5, type=int,
+                            help='Average shopping cart recipes per user')
+        parser.add_argument('--follows', default=10, type=int,
+                            help='Average subscriptions per user')
+        parser.add_argument('--skew', default=1.1, type=float,
+                            help='Zipf exponent of popularity')
+        parser.add_argument('--seed', default=0, type=int)
+        parser.add_argument('--iterations', default=50, type=int)
+        parser.add_argument('--warmup', default=5, type=int)
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear caches before every request')
+        parser.add_argument('--scenario', action='append',
+                            choices=[scenario.name for scenario in SCENARIOS],
+                            help='Run only the given scenarios')
+        parser.add_argument('--output', type=str,
+                            help='JSON file for results, stdout by default')
+        parser.add_argument('--compare', type=str,
+                            help='JSON file with previous results')
+        parser.add_argument('--parity', action='store_true',
+                            help='Check that the fast recipe list '
+                                 'serializer matches DRF before running')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the test database between runs')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        with override_settings(CACHES=CACHES):
+            dataset, mismatches, scenarios = self.run_in_test_db(
+                old_name, options
+            )
+        results = {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'dataset': dataset,
+            'iterations': options['iterations'],
+            'cold': options['cold'],
+            'scenarios': scenarios,
+        }
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.compare(json.load(file)['scenarios'], scenarios)
+        if mismatches:
+            raise CommandError(
+                f'Fast serializer output differs: {", ".join(mismatches)}'
+            )
+        if any(result['budget_exceeded'] for result in scenarios.values()):
+            raise CommandError('Query budget exceeded')
+
+    def run_in_test_db(self, old_name, options):
+        """Замер во временной тестовой базе."""
+
+        connection.creation.create_test_db(
+            verbosity=0, keepdb=options['keepdb']
+        )
+        try:
+            dataset = generate_data(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients_per_recipe=options['ingredients_per_recipe'],
+                ingredients=options['ingredients'],
+                favorites=options['favorites'],
+                carts=options['carts'],
+                follows=options['follows'],
+                skew=options['skew'],
+                seed=options['seed'],
+            )
+            mismatches = (
+                check_parity(options['scenario']) if options['parity'] else []
+            )
+            scenarios = run_benchmark(
+                options['iterations'], options['warmup'], options['cold'],
+                options['scenario']
+            )
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+        return dataset, mismatches, scenarios
+
+    def compare(self, previous, current):
+        self.stderr.write(
+            f'{"scenario":<24}{"p50 ms":>18}{"p95 ms":>18}{"queries":>12}'
+        )
+        for name, result in current.items():
+            before = previous.get(name)
+            if before is None:
+                continue
+            self.stderr.write(
+                f'{name:<24}'
+                f'{before["p50_ms"]:>8.2f} ->{result["p50_ms"]:>8.2f}'
+                f'{before["p95_ms"]:>8.2f} ->{result["p95_ms"]:>8.2f}'
+                f'{before["queries"]:>5} ->{result["queries"]:>5}'
+            )
@@ -0,0 +1,230 @@
+import glob
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Lock
+
+from django.conf import settings
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+_local = threading.local()
+
+
+def percentile(samples, quantile):
+    """Перцентиль по методу ближайшего ранга."""
+
+    if not samples:
+        return math.nan
+    samples = sorted(samples)
+    return samples[max(math.ceil(quantile * len(samples)) - 1, 0)]
+
+
+class EndpointStats:
+    """Счетчики и последние времена ответа одного адреса."""
+
+    def __init__(self, window):
+        self.requests = 0
+        self.errors = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_seconds = 0.0
+        self.seconds = 0.0
+        self.samples = deque(maxlen=window)
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'queries': self.queries,
+            'db_seconds': self.db_seconds,
+            'serialize_seconds': self.serialize_seconds,
+            'render_seconds': self.render_seconds,
+            'seconds': self.seconds,
+            'samples': list(self.samples),
+        }
+
+
+class MetricsRegistry:
+    """Метрики запросов процесса.
+
+    Если задан METRICS_DIR, каждый процесс раз в METRICS_FLUSH_INTERVAL
+    секунд сохраняет свои метрики в файл <pid>.json, а выгрузка
+    суммирует файлы всех процессов. Последние времена ответа берутся
+    только из файлов, обновленных за METRICS_SAMPLE_TTL секунд.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.endpoints = {}
+        self.flushed = 0
+
+    def record(self, endpoint, status, queries, db_seconds,
+               serialize_seconds, render_seconds, seconds):
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats(
+                    settings.METRICS_WINDOW
+                )
+            stats.requests += 1
+            stats.errors += status >= 500
+            stats.queries += queries
+            stats.db_seconds += db_seconds
+            stats.serialize_seconds += serialize_seconds
+            stats.render_seconds += render_seconds
+            stats.seconds += seconds
+            stats.samples.append(seconds)
+        self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                endpoint: stats.as_dict()
+                for endpoint, stats in self.endpoints.items()
+            }
+
+    def flush(self, force=False):
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if (not force
+                    and now - self.flushed < settings.METRICS_FLUSH_INTERVAL):
+                return
+            self.flushed = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """Метрики всех процессов, сложенные по адресам."""
+
+        directory = settings.METRICS_DIR
+        if not directory:
+            return self.snapshot()
+        self.flush(force=True)
+        deadline = time.time() - settings.METRICS_SAMPLE_TTL
+        result = {}
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                fresh = os.path.getmtime(path) >= deadline
+                with open(path) as file:
+                    endpoints = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for endpoint, stats in endpoints.items():
+                total = result.setdefault(endpoint, {
+                    'requests': 0, 'errors': 0, 'queries': 0,
+                    'db_seconds': 0.0, 'serialize_seconds': 0.0,
+                    'render_seconds': 0.0, 'seconds': 0.0, 'samples': [],
+                })
+                for name, value in stats.items():
+                    if name != 'samples':
+                        total[name] = total.get(name, 0) + value
+                if fresh:
+                    total['samples'].extend(stats['samples'])
+        return result
+
+
+def start_request(counter):
+    """Начать учет времени сериализации запроса в текущем потоке."""
+
+    _local.counter = counter
+    _local.depth = 0
+    _local.serialize_seconds = 0.0
+
+
+def finish_request():
+    """Время сериализации запроса без SQL-запросов."""
+
+    seconds = getattr(_local, 'serialize_seconds', 0.0)
+    _local.counter = None
+    _local.serialize_seconds = 0.0
+    return seconds
+
+
+@contextmanager
+def serialization_timer():
+    """Учесть время блока как время сериализации запроса.
+
+    Вложенные блоки не учитываются повторно, время SQL-запросов
+    внутри блока вычитается.
+    """
+
+    counter = getattr(_local, 'counter', None)
+    if counter is None or _local.depth:
+        yield
+        return
+    _local.depth += 1
+    db_seconds = counter.seconds
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.depth -= 1
+        _local.serialize_seconds += (
+            time.perf_counter() - started - (counter.seconds - db_seconds)
+        )
+
+
+class SerializationTimerMixin:
+    """Учет времени to_representation сериализатора в метриках."""
+
+    def to_representation(self, instance):
+        with serialization_timer():
+            return super().to_representation(instance)
+
+
+def render_prometheus(endpoints):
+    """Метрики в текстовом формате Prometheus."""
+
+    lines = [
+        '# HELP foodgram_request_seconds Request duration.',
+        '# TYPE foodgram_request_seconds summary',
+    ]
+    for endpoint, stats in sorted(endpoints.items()):
+        for quantile in QUANTILES:
+            value = percentile(stats['samples'], quantile)
+            lines.append(
+                f'foodgram_request_seconds{{endpoint="{endpoint}",'
+                f'quantile="{quantile}"}} {value}'
+            )
+        lines.append(
+            f'foodgram_request_seconds_sum{{endpoint="{endpoint}"}} '
+            f'{stats["seconds"]}'
+        )
+        lines.append(
+            f'foodgram_request_seconds_count{{endpoint="{endpoint}"}} '
+            f'{stats["requests"]}'
+        )
+    counters = (
+        ('request_errors_total', 'errors', 'Responses with status 5xx.'),
+        ('db_queries_total', 'queries', 'SQL queries.'),
+        ('db_seconds_total', 'db_seconds', 'Time spent in SQL queries.'),
+        ('serialize_seconds_total', 'serialize_seconds',
+         'Time spent in serializers, excluding SQL queries.'),
+        ('render_seconds_total', 'render_seconds',
+         'Time spent rendering responses.'),
+    )
+    for name, field, description in counters:
+        lines.append(f'# HELP foodgram_{name} {description}')
+        lines.append(f'# TYPE foodgram_{name} counter')
+        for endpoint, stats in sorted(endpoints.items()):
+            lines.append(
+                f'foodgram_{name}{{endpoint="{endpoint}"}} '
+                f'{stats.get(field, 0)}'
+            )
+    return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,91 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import finish_request, registry, start_request
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Обертка выполнения SQL, считающая запросы и их время."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """Число и время SQL-запросов, время сериализации, отрисовки и ответа.
+
+    Метрики сохраняются по имени адреса из URLconf и отдаются
+    клиенту заголовком Server-Timing. Ошибка сохранения метрик
+    записывается в журнал и не влияет на ответ.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        start_request(counter)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                response = self.get_response(request)
+        finally:
+            serialize_seconds = finish_request()
+        seconds = time.perf_counter() - started
+        render_seconds = getattr(request, '_render_seconds', 0.0)
+        app_seconds = max(
+            seconds - counter.seconds - serialize_seconds - render_seconds,
+            0.0
+        )
+        response['Server-Timing'] = (
+            f'db;dur={counter.seconds * 1000:.1f};'
+            f'desc="{counter.count} queries", '
+            f'serialize;dur={serialize_seconds * 1000:.1f}, '
+            f'app;dur={app_seconds * 1000:.1f}, '
+            f'render;dur={render_seconds * 1000:.1f}, '
+            f'total;dur={seconds * 1000:.1f}'
+        )
+        try:
+            registry.record(
+                self.get_endpoint(request), response.status_code,
+                counter.count, counter.seconds, serialize_seconds,
+                render_seconds, seconds
+            )
+        except Exception:
+            logger.exception('Не удалось сохранить метрики запроса')
+        return response
+
+    def process_template_response(self, request, response):
+        render_started = time.perf_counter()
+
+        def rendered(response):
+            request._render_seconds = time.perf_counter() - render_started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    @staticmethod
+    def get_endpoint(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.view_name or match.route
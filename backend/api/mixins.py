@@ -0,0 +1,152 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_generations
+from .compression import compress, compressed_response
+from .renderers import FastJSONRenderer
+
+RESPONSE_KEY = 'response_body:{}:{}'
+
+
+def get_query_scopes(view, request):
+    """Поколения, от которых ответ зависит при заданных действии и
+    параметрах.
+
+    view.action_generation_scopes сопоставляет действию вьюсета
+    области, например популярным рецептам - 'trending', а
+    view.query_generation_scopes - параметру запроса, например
+    сортировке по популярности - 'popularity'.
+    """
+
+    scopes = list(view.action_generation_scopes.get(view.action, ()))
+    for param, param_scopes in view.query_generation_scopes.items():
+        if param in request.query_params:
+            scopes.extend(param_scopes)
+    return scopes
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы по поколениям данных.
+
+    ETag и Last-Modified вычисляются из поколений generation_scopes в
+    кэше без запросов к базе, поэтому неизменившийся ответ отдается
+    статусом 304 без сериализации. Для user_dependent-вьюсетов в ключ
+    входит поколение состояния пользователя (избранное, покупки,
+    подписки). Для retrieve можно задать отдельный набор
+    object_generation_scopes и метки объекта в get_object_stamps.
+    """
+
+    generation_scopes = ()
+    object_generation_scopes = None
+    action_generation_scopes = {}
+    query_generation_scopes = {}
+    user_dependent = False
+
+    def get_generation_scopes(self, request):
+        scopes = self.generation_scopes
+        if (self.action == 'retrieve'
+                and self.object_generation_scopes is not None):
+            scopes = self.object_generation_scopes
+        scopes = list(scopes) + get_query_scopes(self, request)
+        if self.user_dependent and request.user.is_authenticated:
+            scopes.append(f'user:{request.user.id}')
+        return scopes
+
+    def get_object_stamps(self):
+        """Дополнительные метки изменения объекта для retrieve."""
+
+        return []
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        stamps = get_generations(self.get_generation_scopes(request))
+        if self.action == 'retrieve':
+            stamps.extend(self.get_object_stamps())
+        key = f'{request.get_full_path()}|{request.user.id}|{stamps}'
+        etag = quote_etag(md5(key.encode()).hexdigest())
+        last_modified = max(stamps) // 1000000 if stamps else None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            if response.has_header('Content-Encoding'):
+                etag = f'W/{etag}'
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, no_cache=True)
+            if self.user_dependent:
+                patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class AnonymousResponseCacheMixin:
+    """Кэш ответов list и retrieve для анонимных пользователей.
+
+    Ответ анонимному пользователю зависит только от адреса и параметров
+    запроса, поэтому готовое тело JSON вместе со сжатыми gzip и brotli
+    вариантами сохраняется в кэше 'responses'. Ключ строится по
+    нормализованным параметрам запроса и поколениям generation_scopes,
+    так что изменение данных делает старые записи недостижимыми.
+    """
+
+    generation_scopes = ()
+    action_generation_scopes = {}
+    query_generation_scopes = {}
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+        )
+        scopes = (
+            list(self.generation_scopes) + get_query_scopes(self, request)
+        )
+        key = (
+            f'{self.basename}|{self.action}|{self.kwargs}|'
+            f'{request.get_host()}|{params}|'
+            f'{get_generations(scopes)}'
+        )
+        return RESPONSE_KEY.format(
+            self.basename, md5(key.encode()).hexdigest()
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (not settings.RESPONSE_CACHE_ENABLED
+                or request.user.is_authenticated
+                or request.accepted_renderer.format != 'json'):
+            return handler(request, *args, **kwargs)
+        cache = caches['responses']
+        key = self.get_response_cache_key(request)
+        variants = cache.get(key)
+        if variants is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            variants = compress(FastJSONRenderer().render(response.data))
+            cache.set(key, variants)
+        return compressed_response(request, variants)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
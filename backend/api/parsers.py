@@ -0,0 +1,36 @@
+import json
+
+from django.conf import settings
+from rest_framework import parsers, status
+from rest_framework.exceptions import APIException, ParseError
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Слишком большой запрос.'
+    default_code = 'request_too_large'
+
+
+def json_max_bytes():
+    """Наибольший размер JSON с изображением в base64."""
+
+    return (
+        -(-settings.IMAGE_UPLOAD_MAX_BYTES // 3) * 4
+        + settings.RECIPE_JSON_MAX_EXTRA_BYTES
+    )
+
+
+class LimitedJSONParser(parsers.JSONParser):
+    """JSONParser, не читающий тело больше json_max_bytes()."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        max_bytes = json_max_bytes()
+        body = stream.read(max_bytes + 1)
+        if len(body) > max_bytes:
+            raise RequestTooLarge()
+        try:
+            return json.loads(body.decode(encoding))
+        except ValueError as error:
+            raise ParseError(f'JSON parse error - {error}')
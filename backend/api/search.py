@@ -0,0 +1,138 @@
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Lower
+from recipes.models import Ingredient
+from rest_framework.response import Response
+
+from .cache import get_generation
+
+PREFIX_RANK = 0
+SUBSTRING_RANK = 1
+
+
+class IngredientIndex:
+    """Отсортированный индекс ингредиентов в памяти процесса.
+
+    Хранит строки ответа целиком, поэтому поиск не обращается к базе.
+    """
+
+    def __init__(self, rows):
+        self.keys = sorted(
+            (name.lower(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in rows
+        )
+
+    def prefix(self, query):
+        """Ингредиенты, название которых начинается с query."""
+
+        result = []
+        for key in self.keys[bisect_left(self.keys, (query,)):]:
+            if not key[0].startswith(query):
+                break
+            result.append(key)
+        return result
+
+    def substring(self, query):
+        """Ингредиенты, содержащие query не в начале названия."""
+
+        return [
+            key for key in self.keys
+            if query in key[0] and not key[0].startswith(query)
+        ]
+
+
+class IngredientSearch:
+    """Поиск ингредиентов для автодополнения.
+
+    Индекс хранится в памяти процесса и перестраивается, когда меняется
+    поколение 'ingredients' в общем кэше; find отдает найденные строки
+    из него без запросов к базе. При выключенном
+    INGREDIENT_SEARCH_IN_MEMORY поиск выполняется запросами к базе,
+    на PostgreSQL их обслуживает GIN-индекс pg_trgm. Совпадения по
+    началу названия идут раньше совпадений по подстроке; если ничего не
+    найдено, на PostgreSQL выполняется нечеткий поиск по триграммам.
+    """
+
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.lock = Lock()
+
+    def get_index(self):
+        version = get_generation('ingredients')
+        if self.version != version:
+            with self.lock:
+                if self.version != version:
+                    self.index = IngredientIndex(
+                        Ingredient.objects.values_list(
+                            'id', 'name', 'measurement_unit'
+                        )
+                    )
+                    self.version = version
+        return self.index
+
+    def find(self, query):
+        """Строки ответа для query из индекса в памяти.
+
+        Совпадения по началу названия идут первыми, внутри групп строки
+        упорядочены по названию.
+        """
+
+        query = query.strip().lower()
+        index = self.get_index()
+        keys = index.prefix(query) + index.substring(query)
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in keys
+        ]
+
+    def search(self, queryset, query):
+        """Поиск запросами к базе с нечетким поиском на PostgreSQL."""
+
+        query = query.strip().lower()
+        if not query:
+            return queryset
+        found = queryset.filter(name__icontains=query)
+        prefix = queryset.filter(name__istartswith=query).values('pk')
+        if connection.vendor == 'postgresql' and not found.exists():
+            return self.fuzzy(queryset, query)
+        return found.annotate(
+            search_rank=Case(
+                When(pk__in=prefix, then=Value(PREFIX_RANK)),
+                default=Value(SUBSTRING_RANK),
+                output_field=IntegerField()
+            )
+        ).order_by('search_rank', Lower('name'))
+
+    def fuzzy(self, queryset, query):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        return queryset.annotate(
+            similarity=TrigramSimilarity('name', query)
+        ).filter(
+            similarity__gte=settings.INGREDIENT_SEARCH_SIMILARITY
+        ).order_by('-similarity', 'name')
+
+
+class IngredientSearchMixin:
+    """list с параметром name из индекса ingredient_search.
+
+    Если в индексе ничего нет, на PostgreSQL запрос обрабатывается
+    обычным образом ради нечеткого поиска.
+    """
+
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('name', '')
+        if not query.strip() or not settings.INGREDIENT_SEARCH_IN_MEMORY:
+            return super().list(request, *args, **kwargs)
+        rows = ingredient_search.find(query)
+        if not rows and connection.vendor == 'postgresql':
+            return super().list(request, *args, **kwargs)
+        return Response(rows)
+
+
+ingredient_search = IngredientSearch()
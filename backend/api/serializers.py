@@ -1,30 +1,63 @@
+import json
+
 import users.serializers as users
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Manager, Prefetch, prefetch_related_objects
+from django.http import QueryDict
 from drf_extra_fields.fields import Base64ImageField
-from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from recipes.images import (delete_renditions, rendition_urls,
+                            schedule_renditions)
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
 from rest_framework import serializers, validators
-from rest_framework.serializers import BooleanField
+from users.utils import get_subscriptions
+
+from .cache import get_membership
+from .fields import BulkPrimaryKeyRelatedField, RecipeImageField, resolve_ids
+from .metrics import SerializationTimerMixin, serialization_timer
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SerializationTimerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Tag
         fields = '__all__'
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(
+    SerializationTimerMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = Ingredient
         fields = ('__all__')
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+def get_images(obj, request):
+    """Адреса уменьшенных копий изображения или None, пока их нет."""
+
+    if not obj.renditions:
+        return None
+    images = rendition_urls(obj.image.name, obj.renditions.split(','))
+    if request is not None:
+        for urls in images.values():
+            for file_format, url in urls.items():
+                urls[file_format] = request.build_absolute_uri(url)
+    return images
+
+
+class ShortRecipeSerializer(
+    SerializationTimerMixin, serializers.ModelSerializer
+):
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
+
+    def get_images(self, obj):
+        return get_images(obj, self.context.get('request'))
 
 
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
@@ -49,16 +82,104 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         return f'{self.ingredient} in {self.recipe}'
 
 
+class AddIngredientListSerializer(serializers.ListSerializer):
+    """Ингредиенты рецепта, найденные одним запросом."""
+
+    def to_internal_value(self, data):
+        ingredients = super().to_internal_value(data)
+        objects = resolve_ids(
+            Ingredient.objects.all(),
+            [ingredient['id'] for ingredient in ingredients]
+        )
+        for ingredient in ingredients:
+            ingredient['id'] = objects[ingredient['id']]
+        return ingredients
+
+
 class AddIngredientSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'amount')
+        list_serializer_class = AddIngredientListSerializer
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Список рецептов без полей DRF.
+
+    Словари собираются прямо из рецептов с загруженными автором,
+    тегами и ингредиентами и совпадают с выводом RecipeSerializer.
+    Автор и теги сериализуются один раз на список. При
+    RECIPE_FAST_SERIALIZER = False используется обычный путь DRF.
+    """
 
+    def to_representation(self, data):
+        if not settings.RECIPE_FAST_SERIALIZER:
+            return super().to_representation(data)
+        with serialization_timer():
+            return self.fast_representation(data)
 
-class RecipeSerializer(serializers.ModelSerializer):
+    def fast_representation(self, data):
+        request = self.context.get('request')
+        favorites = get_membership(request, Favorite)
+        shopping_cart = get_membership(request, ShoppingCart)
+        subscriptions = get_subscriptions(request)
+        authors, tags = {}, {}
+        recipes = data.all() if isinstance(data, Manager) else data
+        result = []
+        for recipe in recipes:
+            author = authors.get(recipe.author_id)
+            if author is None:
+                user = recipe.author
+                author = authors[user.id] = {
+                    'email': user.email,
+                    'id': user.id,
+                    'username': user.username,
+                    'first_name': user.first_name,
+                    'last_name': user.last_name,
+                    'is_subscribed': user.id in subscriptions,
+                }
+            recipe_tags = []
+            for tag in recipe.tags.all():
+                if tag.id not in tags:
+                    tags[tag.id] = {
+                        'id': tag.id,
+                        'name': tag.name,
+                        'color': tag.color,
+                        'slug': tag.slug,
+                    }
+                recipe_tags.append(tags[tag.id])
+            image = None
+            if recipe.image:
+                image = recipe.image.url
+                if request is not None:
+                    image = request.build_absolute_uri(image)
+            result.append({
+                'id': recipe.id,
+                'tags': recipe_tags,
+                'author': author,
+                'ingredients': [
+                    {
+                        'id': row.ingredient_id,
+                        'name': row.ingredient.name,
+                        'measurement_unit': row.ingredient.measurement_unit,
+                        'amount': row.amount,
+                    } for row in recipe.ingredient_in_recipe.all()
+                ],
+                'is_favorited': recipe.id in favorites,
+                'is_in_shopping_cart': recipe.id in shopping_cart,
+                'name': recipe.name,
+                'image': image,
+                'images': get_images(recipe, request),
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+            })
+        return result
+
+
+class RecipeSerializer(SerializationTimerMixin, serializers.ModelSerializer):
     author = users.UserSerializer()
     tags = TagSerializer(read_only=True, many=True)
     ingredients = IngredientInRecipeSerializer(
@@ -66,22 +187,39 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only=True, many=True
     )
     image = Base64ImageField()
-    is_favorited = BooleanField(read_only=True)
-    is_in_shopping_cart = BooleanField(read_only=True)
+    images = serializers.SerializerMethodField()
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'images', 'text', 'cooking_time')
+        list_serializer_class = RecipeListSerializer
+
+    def get_images(self, obj):
+        return get_images(obj, self.context.get('request'))
+
+    def get_is_favorited(self, obj):
+        return obj.id in get_membership(self.context.get('request'), Favorite)
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in get_membership(
+            self.context.get('request'), ShoppingCart
+        )
 
 
 class CreateRecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField(max_length=None)
+    """Создание и изменение рецепта.
+
+    Принимает JSON с изображением в base64 или multipart/form-data с
+    файлом изображения, тегами tags и списком ingredients в JSON.
+    """
+
+    image = RecipeImageField()
     ingredients = AddIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True
-    )
+    tags = BulkPrimaryKeyRelatedField(queryset=Tag.objects.all())
 
     class Meta:
         model = Recipe
@@ -95,9 +233,39 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         )
 
     def to_representation(self, instance):
-        serializer = RecipeSerializer(instance)
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'ingredient_in_recipe',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+        serializer = RecipeSerializer(instance, context=self.context)
         return serializer.data
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = self.parse_form(data)
+        return super().to_internal_value(data)
+
+    def parse_form(self, data):
+        """Данные формы multipart в виде, общем с JSON."""
+
+        values = data.dict()
+        if 'tags' in data:
+            values['tags'] = data.getlist('tags')
+        if 'ingredients' in data:
+            try:
+                values['ingredients'] = json.loads(data['ingredients'])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {'ingredients': ['Ожидается список в формате JSON.']}
+                )
+        return values
+
     def add_ingredients(self, ingredients, recipe):
         IngredientInRecipe.objects.bulk_create(
             [IngredientInRecipe(
@@ -107,6 +275,38 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             ) for ingredient in ingredients]
         )
 
+    def update_ingredients(self, ingredients, recipe):
+        """Изменить только отличающиеся строки ингредиентов рецепта.
+
+        Удаляются убранные ингредиенты, обновляются изменившиеся
+        количества и добавляются новые ингредиенты.
+        """
+
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed, changed = [], []
+        for row in recipe.ingredient_in_recipe.all():
+            amount = amounts.pop(row.ingredient_id, None)
+            if amount is None:
+                removed.append(row.pk)
+            elif amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        if removed:
+            IngredientInRecipe.objects.filter(pk__in=removed).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ('amount',))
+        if amounts:
+            IngredientInRecipe.objects.bulk_create(
+                [IngredientInRecipe(
+                    recipe=recipe,
+                    ingredient_id=ingredient_id,
+                    amount=amount,
+                ) for ingredient_id, amount in amounts.items()]
+            )
+
     @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
@@ -115,16 +315,24 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe.tags.set(tags)
         recipe.save()
         self.add_ingredients(ingredients, recipe)
+        transaction.on_commit(lambda: schedule_renditions(recipe))
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        instance.ingredients.clear()
-        self.add_ingredients(ingredients, instance)
-        instance.tags.clear()
+        self.update_ingredients(ingredients, instance)
         instance.tags.set(tags)
+        if 'image' in validated_data:
+            old_image = instance.image.name
+            old_formats = instance.renditions
+            validated_data['renditions'] = ''
+            transaction.on_commit(lambda: schedule_renditions(instance))
+            if old_formats:
+                transaction.on_commit(lambda: delete_renditions(
+                    old_image, old_formats.split(',')
+                ))
         return super().update(instance, validated_data)
 
     def validate(self, validated_data):
@@ -0,0 +1,58 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag, TrendingScore)
+from users.models import Follow, User
+from users.utils import invalidate_followed_ids
+
+from .cache import bump_generation_on_commit, invalidate_membership
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(**kwargs):
+    bump_generation_on_commit('recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(**kwargs):
+    bump_generation_on_commit('tags')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(**kwargs):
+    bump_generation_on_commit('ingredients')
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def shopping_cart_changed(instance, **kwargs):
+    bump_generation_on_commit(f'shopping_cart:{instance.user_id}')
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=Follow)
+def user_state_changed(instance, **kwargs):
+    invalidate_membership(instance.user_id)
+    bump_generation_on_commit(f'user:{instance.user_id}')
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def following_changed(instance, **kwargs):
+    invalidate_followed_ids(instance.user_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Favorite)
+def trending_event_removed(instance, **kwargs):
+    TrendingScore.objects.filter(
+        recipe_id=instance.recipe_id
+    ).update(stale=True)
+
+
+@receiver((post_save, post_delete), sender=User)
+def users_changed(update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_generation_on_commit('users')
@@ -0,0 +1,40 @@
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Запрос выполнил больше SQL-запросов, чем разрешено."""
+
+
+@contextmanager
+def assert_max_queries(max_queries, using=connection):
+    """Проверка, что блок кода укладывается в лимит SQL-запросов.
+
+    Пример использования в тестах:
+
+        with assert_max_queries(6):
+            client.get('/api/recipes/?limit=50')
+    """
+
+    with CaptureQueriesContext(using) as context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > max_queries:
+        queries = '\n'.join(
+            f'{number}. {query["sql"]}'
+            for number, query in enumerate(context.captured_queries, 1)
+        )
+        raise QueryBudgetExceeded(
+            f'Выполнено {executed} запросов при лимите {max_queries}:\n'
+            f'{queries}'
+        )
+
+
+def assert_view_queries(client, url, max_queries, **kwargs):
+    """GET-запрос к url с проверкой лимита SQL-запросов."""
+
+    with assert_max_queries(max_queries):
+        response = client.get(url, **kwargs)
+    return response
@@ -0,0 +1,286 @@
+import base64
+import json
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from PIL import Image
+from rest_framework.test import APIClient, APIRequestFactory
+from users.models import Follow, User
+
+from .renderers import FastJSONRenderer
+from .serializers import RecipeSerializer
+from .testing import assert_view_queries
+from .views import RecipeViewSet
+
+CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'tests-{alias}',
+    }
+    for alias in ('default', 'responses', 'generations')
+}
+
+
+@override_settings(CACHES=CACHES)
+class RecipeDataTestCase(TestCase):
+    """Рецепты с тегами, ингредиентами, избранным и подписками."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com',
+                password='password', first_name='Test', last_name=str(number)
+            ) for number in range(4)
+        ]
+        cls.user = cls.users[0]
+        tags = [
+            Tag.objects.create(
+                name=f'Tag {number}', slug=f'tag{number}',
+                color=f'#00000{number}'
+            ) for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'ingredient {number}', measurement_unit='г'
+            ) for number in range(10)
+        ]
+        cls.recipes = []
+        for number in range(20):
+            recipe = Recipe.objects.create(
+                author=cls.users[number % 4], name=f'Recipe {number}',
+                text='Text', cooking_time=10, image='recipes/test.jpg'
+            )
+            recipe.tags.set(tags[:number % 3 + 1])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                ) for ingredient in ingredients[:number % 5 + 1]
+            )
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[::2]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        for author in cls.users[1:3]:
+            Follow.objects.create(user=cls.user, author=author)
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in cls.recipes[:5]]
+        ).update(renditions='webp,jpeg')
+        Recipe.objects.filter(pk=cls.recipes[5].pk).update(image='')
+
+    def setUp(self):
+        for alias in CACHES:
+            caches[alias].clear()
+
+
+class QueryBudgetTests(RecipeDataTestCase):
+    """Число SQL-запросов не зависит от размера страницы."""
+
+    RECIPE_LIST_QUERIES = 7
+    RECIPE_FILTERED_QUERIES = 8
+    RECIPE_DETAIL_QUERIES = 7
+    SUBSCRIPTIONS_QUERIES = 4
+
+    def setUp(self):
+        super().setUp()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_budget(self, client, url, max_queries):
+        response = assert_view_queries(client, url, max_queries)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_recipe_list(self):
+        for limit in (1, 20):
+            with self.subTest(limit=limit):
+                caches['default'].clear()
+                caches['responses'].clear()
+                response = self.assert_budget(
+                    self.anonymous, f'/api/recipes/?limit={limit}',
+                    self.RECIPE_LIST_QUERIES
+                )
+                self.assertEqual(len(response.json()['results']), limit)
+
+    def test_recipe_list_authenticated(self):
+        for limit in (1, 20):
+            with self.subTest(limit=limit):
+                caches['default'].clear()
+                self.assert_budget(
+                    self.client, f'/api/recipes/?limit={limit}',
+                    self.RECIPE_LIST_QUERIES
+                )
+
+    def test_recipe_list_filtered(self):
+        self.assert_budget(
+            self.client, '/api/recipes/?is_favorited=1&tags=tag0&limit=20',
+            self.RECIPE_FILTERED_QUERIES
+        )
+
+    def test_recipe_detail(self):
+        self.assert_budget(
+            self.client, f'/api/recipes/{self.recipes[4].id}/',
+            self.RECIPE_DETAIL_QUERIES
+        )
+
+    def test_subscriptions(self):
+        for limit in (1, 10):
+            with self.subTest(recipes_limit=limit):
+                caches['default'].clear()
+                response = self.assert_budget(
+                    self.client,
+                    f'/api/users/subscriptions/?recipes_limit={limit}',
+                    self.SUBSCRIPTIONS_QUERIES
+                )
+                self.assertEqual(len(response.json()['results']), 2)
+
+
+class RecipeSerializerParityTests(RecipeDataTestCase):
+    """Быстрый сериализатор списка рецептов совпадает с DRF."""
+
+    def serialize(self, user, fast):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        recipes = RecipeViewSet().get_queryset().order_by('id')
+        with override_settings(RECIPE_FAST_SERIALIZER=fast):
+            return RecipeSerializer(
+                recipes, many=True, context={'request': request}
+            ).data
+
+    def test_parity(self):
+        for user in (AnonymousUser(), self.user):
+            with self.subTest(user=user):
+                expected = self.serialize(user, fast=False)
+                self.assertEqual(self.serialize(user, fast=True), expected)
+
+    def test_parity_flags(self):
+        recipes = {
+            recipe['id']: recipe
+            for recipe in self.serialize(self.user, fast=True)
+        }
+        recipe = recipes[self.recipes[0].id]
+        self.assertTrue(recipe['is_favorited'])
+        self.assertTrue(recipe['is_in_shopping_cart'])
+        self.assertFalse(recipe['author']['is_subscribed'])
+        self.assertIsNotNone(recipe['images'])
+        self.assertIsNone(recipes[self.recipes[5].id]['image'])
+        self.assertTrue(recipes[self.recipes[1].id]['author']['is_subscribed'])
+
+    def test_api_parity(self):
+        client = APIClient()
+        authenticated = APIClient()
+        authenticated.force_authenticate(self.user)
+        for client in (client, authenticated):
+            responses = []
+            for fast in (False, True):
+                for alias in CACHES:
+                    caches[alias].clear()
+                with override_settings(RECIPE_FAST_SERIALIZER=fast):
+                    responses.append(
+                        client.get('/api/recipes/?limit=20').json()
+                    )
+            self.assertEqual(responses[0], responses[1])
+
+
+class RecipeImageUploadTests(RecipeDataTestCase):
+    """Загрузка изображения рецепта строкой base64 и файлом multipart."""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_settings = self.settings(MEDIA_ROOT=media.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_image(self, size):
+        """PNG из шума: не сжимается и занимает около 3 * size ** 2 байт."""
+
+        buffer = BytesIO()
+        Image.frombytes(
+            'RGB', (size, size), os.urandom(size * size * 3)
+        ).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def recipe_data(self, image):
+        return {
+            'name': 'Uploaded',
+            'text': 'Text',
+            'cooking_time': 5,
+            'tags': [Tag.objects.first().id],
+            'ingredients': [
+                {'id': Ingredient.objects.first().id, 'amount': 10}
+            ],
+            'image': image,
+        }
+
+    def assert_uploaded(self, response, content):
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        self.assertEqual(recipe.image.size, len(content))
+        with recipe.image.open() as image:
+            self.assertEqual(image.read(), content)
+
+    def test_base64_larger_than_spool(self):
+        content = self.make_image(800)
+        self.assertGreater(len(content), settings.IMAGE_UPLOAD_SPOOL_SIZE)
+        encoded = base64.b64encode(content).decode()
+        response = self.client.post(
+            '/api/recipes/',
+            self.recipe_data(f'data:image/png;base64,{encoded}'),
+            format='json'
+        )
+        self.assert_uploaded(response, content)
+
+    def test_multipart(self):
+        content = self.make_image(100)
+        data = self.recipe_data(SimpleUploadedFile(
+            'image.png', content, content_type='image/png'
+        ))
+        data['ingredients'] = json.dumps(data['ingredients'])
+        response = self.client.post(
+            '/api/recipes/', data, format='multipart'
+        )
+        self.assert_uploaded(response, content)
+
+
+class RecipeValidationTests(RecipeDataTestCase):
+    """Ошибки проверки рецепта отдаются как 400, а не 500."""
+
+    def test_invalid_tag_ids(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for tags in (['q'], [None]):
+            with self.subTest(tags=tags):
+                response = client.post('/api/recipes/', {
+                    'name': 'Invalid',
+                    'text': 'Text',
+                    'cooking_time': 5,
+                    'tags': tags,
+                    'ingredients': [
+                        {'id': Ingredient.objects.first().id, 'amount': 1}
+                    ],
+                    'image': 'data:image/png;base64,AAAA',
+                }, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('0', response.json()['tags'])
+
+    def test_renderer_non_str_keys(self):
+        data = {'tags': {0: ['error']}, 'big': 2 ** 64, None: True}
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
@@ -1,20 +1,25 @@
+import os
+
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from rest_framework.validators import ValidationError
+
+from .exporters import EXPORTERS
 
 
-def convert_txt(shop_list):
-    """Формирование списка ингридиентов."""
+def shopping_cart_response(rows, file_format):
+    """Потоковая выгрузка списка ингридиентов в выбранном формате."""
 
-    file_name = settings.SHOPPING_CART_FILE_NAME
-    lines = []
-    for ing in shop_list:
-        name = ing['ingredient__name']
-        measurement_unit = ing['ingredient__measurement_unit']
-        amount = ing['ingredient_total']
-        lines.append(f'{name} ({measurement_unit}) - {amount}')
-    lines.append('\nFoodGram Service')
-    content = '\n'.join(lines)
-    content_type = 'text/plain,charset=utf8'
-    response = HttpResponse(content, content_type=content_type)
-    response['Content-Disposition'] = f'attachment; filename={file_name}'
+    if file_format not in EXPORTERS:
+        raise ValidationError(
+            {'type': f'Доступные форматы: {", ".join(EXPORTERS)}'}
+        )
+    exporter = EXPORTERS[file_format]()
+    file_name = os.path.splitext(settings.SHOPPING_CART_FILE_NAME)[0]
+    response = StreamingHttpResponse(
+        exporter.render(rows), content_type=exporter.content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename={file_name}.{exporter.extension}'
+    )
     return response
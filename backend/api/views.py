@@ -1,49 +1,102 @@
-from django.db.models import BooleanField, Exists, OuterRef, Sum, Value
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import F, Prefetch
+from django.db.models.functions import Greatest
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
+from recipes.bulk import RecipeImporter, export_recipes
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
                             ShoppingCart, Tag)
-from rest_framework import mixins, status, viewsets
-from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
+from rest_framework import mixins, parsers, status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import (SAFE_METHODS, AllowAny, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
 from rest_framework.validators import ValidationError
+from users.models import Follow
+from users.utils import get_followed_ids
 
+from .cache import bump_generation, iter_shopping_cart
+from .catalogue import CatalogueMixin, ingredient_catalogue, tag_catalogue
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
-from .permissions import IsAuthorOrReadOnly
+from .metrics import registry, render_prometheus
+from .mixins import AnonymousResponseCacheMixin, ConditionalGetMixin
+from .pagination import CustomPagination, KeysetPagination
+from .parsers import LimitedJSONParser
+from .permissions import IsAuthorOrReadOnly, IsMetricsScraper
+from .search import IngredientSearchMixin
 from .serializers import (CreateRecipeSerializer, IngredientSerializer,
                           RecipeSerializer, ShortRecipeSerializer,
                           TagSerializer)
-from .utils import convert_txt
+from .utils import shopping_cart_response
+
+
+@api_view(('GET',))
+@permission_classes((IsMetricsScraper,))
+def metrics(request):
+    """Метрики запросов в формате Prometheus."""
+
+    return HttpResponse(
+        render_prometheus(registry.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    ConditionalGetMixin,
+    CatalogueMixin,
+    viewsets.ReadOnlyModelViewSet
+):
     """Миксина для списка тегов."""
 
+    generation_scopes = ('tags',)
+    catalogue = tag_catalogue
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
 
 
 class IngredientViewSet(
+    ConditionalGetMixin,
+    CatalogueMixin,
+    IngredientSearchMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     viewsets.GenericViewSet
 ):
     """Миксина для списка ингридиентов."""
 
+    generation_scopes = ('ingredients',)
+    catalogue = ingredient_catalogue
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     filterset_class = IngredientFilter
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ConditionalGetMixin,
+    AnonymousResponseCacheMixin,
+    viewsets.ModelViewSet
+):
     """Вьюсет для рецептов."""
 
+    generation_scopes = ('recipes', 'tags', 'ingredients', 'users')
+    object_generation_scopes = ('tags', 'ingredients', 'users')
+    action_generation_scopes = {'trending': ('trending',)}
+    query_generation_scopes = {'ordering': ('popularity',)}
+    user_dependent = True
+    counter_fields = {
+        Favorite: 'favorites_count',
+        ShoppingCart: 'in_carts_count',
+    }
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = CustomPagination
+    parser_classes = (LimitedJSONParser, parsers.MultiPartParser)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
@@ -53,27 +106,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return CreateRecipeSerializer
 
     def get_queryset(self):
-        """Избранное и список покупок."""
-        queryset = Recipe.objects.prefetch_related('ingredients', 'tags')
-        if self.request.user.is_authenticated:
-            queryset = queryset.annotate(
-                is_favorited=Exists(
-                    Favorite.objects.filter(
-                        user=self.request.user, recipe__id=OuterRef('id')
-                    )
-                ),
-                is_in_shopping_cart=Exists(
-                    ShoppingCart.objects.filter(
-                        user=self.request.user, recipe__id=OuterRef('id')
-                    )
-                ),
-            )
-        else:
-            queryset = queryset.annotate(
-                is_favorited=Value(False, output_field=BooleanField()),
-                is_in_shopping_cart=Value(False, output_field=BooleanField())
+        """Рецепты с авторами, тегами и ингредиентами.
+
+        Признаки is_favorited и is_in_shopping_cart вычисляются по
+        закэшированным множествам рецептов пользователя.
+        """
+        return Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_in_recipe',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
             )
-        return queryset
+        )
+
+    def get_object_stamps(self):
+        """Дата публикации и дата изменения рецепта."""
+
+        try:
+            stamps = Recipe.objects.filter(
+                pk=self.kwargs['pk']
+            ).values_list('pub_date', 'updated').first()
+        except (TypeError, ValueError, DjangoValidationError):
+            return []
+        if stamps is None:
+            return []
+        return [int(stamp.timestamp() * 1000000) for stamp in stamps]
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -102,21 +161,107 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.add_recipe(Favorite, request, pk)
         return self.delete_recipe(Favorite, request, pk)
 
+    @action(
+        detail=False,
+        pagination_class=KeysetPagination
+    )
+    def trending(self, request):
+        """Популярные рецепты по рейтингу с затуханием.
+
+        Рейтинг заранее рассчитывает команда refresh_trending, после
+        нее меняется поколение 'trending', от которого зависят ETag и
+        кэш ответов.
+        """
+
+        return self.conditional_response(
+            partial(self.cached_response, self.get_trending), request
+        )
+
+    def get_trending(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            trending_score__isnull=False
+        ).annotate(
+            score=F('trending_score__score')
+        ).order_by('-score', '-id')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=KeysetPagination
+    )
+    def feed(self, request):
+        """Новые рецепты авторов, на которых подписан пользователь.
+
+        Список авторов берется из кэша. Если их больше
+        FEED_AUTHORS_IN_LIST, фильтр выполняется подзапросом к
+        подпискам, чтобы не передавать в запрос длинный список.
+        """
+
+        followed = get_followed_ids(request.user.id)
+        if len(followed) > settings.FEED_AUTHORS_IN_LIST:
+            followed = Follow.objects.filter(
+                user=request.user
+            ).values('author_id')
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author_id__in=followed
+        ).order_by('-pub_date', '-id')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         permission_classes=(IsAuthenticated,)
     )
     def download_shopping_cart(self, request):
-        """Скачивания списка с ингридиентами."""
+        """Скачивания списка с ингридиентами.
 
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).order_by(
-            'ingredient__name'
-        ).annotate(ingredient_total=Sum('amount'))
-        return convert_txt(ingredients)
+        Формат файла задается параметром type: txt, csv или pdf.
+        """
+
+        return shopping_cart_response(
+            iter_shopping_cart(request.user),
+            request.query_params.get('type', 'txt')
+        )
+
+    @action(
+        detail=False,
+        permission_classes=(IsAdminUser,)
+    )
+    def export(self, request):
+        """Выгрузка всех рецептов в формате NDJSON."""
+
+        response = StreamingHttpResponse(
+            (line.encode() for line in export_recipes()),
+            content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename=recipes.ndjson'
+        )
+        return response
+
+    @action(
+        detail=False,
+        methods=('post',),
+        url_path='import',
+        permission_classes=(IsAdminUser,)
+    )
+    def import_recipes(self, request):
+        """Загрузка рецептов из тела запроса в формате NDJSON.
+
+        Параметр start пропускает уже загруженные строки, его значение
+        для продолжения возвращается в поле lines.
+        """
+
+        try:
+            start = int(request.query_params.get('start', 0))
+        except ValueError:
+            raise ValidationError({'start': 'Ожидается номер строки.'})
+        report = RecipeImporter().run(request.stream or (), start)
+        return Response(report)
 
     def add_recipe(self, model, request, pk):
         """Добавить рецепт."""
@@ -125,7 +270,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if model.objects.filter(recipe=recipe, user=user).exists():
             raise ValidationError('Рецепт уже добавлен')
-        model.objects.create(recipe=recipe, user=user)
+        field = self.counter_fields[model]
+        with transaction.atomic():
+            model.objects.create(recipe=recipe, user=user)
+            Recipe.objects.filter(pk=recipe.pk).update(
+                **{field: F(field) + 1}
+            )
+        bump_generation('popularity')
         serializer = ShortRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -135,5 +286,11 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = get_object_or_404(Recipe, id=pk)
         user = self.request.user
         obj = get_object_or_404(model, recipe=recipe, user=user)
-        obj.delete()
+        field = self.counter_fields[model]
+        with transaction.atomic():
+            obj.delete()
+            Recipe.objects.filter(pk=recipe.pk).update(
+                **{field: Greatest(F(field) - 1, 0)}
+            )
+        bump_generation('popularity')
         return Response(status=status.HTTP_204_NO_CONTENT)
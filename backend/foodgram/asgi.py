@@ -0,0 +1,163 @@
+"""
+ASGI config for foodgram project.
+
+Django 2.2 has no ASGI handler, so the WSGI application runs in thread
+pools behind a small adapter. The request body is received by the
+event loop before a thread is taken. The response is streamed to the
+event loop through a bounded queue, so a thread waits for a slow client
+only when the queue is full. Read requests to recipes, tags and
+ingredients use a separate pool and are not queued behind writes.
+
+Run with:
+
+    gunicorn foodgram.asgi:application -k uvicorn.workers.UvicornWorker
+"""
+
+import asyncio
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from asgiref.wsgi import WsgiToAsgiInstance
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+READ_PATH = re.compile(r'^/api/(recipes|tags|ingredients)/(\d+/)?$')
+QUEUE_SIZE = 16
+
+
+class ThreadPoolWsgiToAsgi:
+    """ASGI-приложение, выполняющее WSGI-приложение в пулах потоков.
+
+    Тело запроса буферизуется во временном файле, в памяти остается не
+    больше ASGI_BUFFER_SIZE байт. Ответ передается циклу событий по
+    частям через очередь из QUEUE_SIZE сообщений.
+    """
+
+    def __init__(self, wsgi_application):
+        self.wsgi_application = wsgi_application
+        self.read_executor = ThreadPoolExecutor(
+            settings.ASGI_READ_THREADS, thread_name_prefix='asgi-read'
+        )
+        self.executor = ThreadPoolExecutor(
+            settings.ASGI_THREADS, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported scope type {scope["type"]}')
+        with SpooledTemporaryFile(max_size=settings.ASGI_BUFFER_SIZE) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            loop = asyncio.get_event_loop()
+            queue = asyncio.Queue(QUEUE_SIZE)
+            future = loop.run_in_executor(
+                self.get_executor(scope), self.run_wsgi_app, scope, body,
+                loop, queue
+            )
+            await self.send_response(queue, send)
+            await future
+
+    @staticmethod
+    async def send_response(queue, send):
+        """Отправить сообщения из очереди до None.
+
+        При ошибке отправки очередь дочитывается, чтобы поток не ждал
+        места в ней.
+        """
+
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                await send(message)
+        except Exception:
+            while await queue.get() is not None:
+                pass
+            raise
+
+    def get_executor(self, scope):
+        if scope['method'] in ('GET', 'HEAD') and READ_PATH.match(
+            scope['path']
+        ):
+            return self.read_executor
+        return self.executor
+
+    def run_wsgi_app(self, scope, body, loop, queue):
+        """Выполнить запрос и передать ответ по частям в очередь.
+
+        Части отправляются по мере получения от WSGI-приложения, поэтому
+        потоковые ответы не собираются целиком. Конец ответа отмечается
+        None. Ответ закрывается в том же потоке, поэтому сигнал
+        request_finished освобождает соединения с базой этого потока.
+        """
+
+        def put(message):
+            asyncio.run_coroutine_threadsafe(
+                queue.put(message), loop
+            ).result()
+
+        try:
+            instance = WsgiToAsgiInstance(self.wsgi_application)
+            instance.scope = scope
+            environ = instance.build_environ(scope, body)
+            response = {}
+
+            def start_response(status, response_headers, exc_info=None):
+                response['start'] = {
+                    'type': 'http.response.start',
+                    'status': int(status.split(' ', 1)[0]),
+                    'headers': [
+                        (name.lower().encode('latin1'),
+                         value.encode('latin1'))
+                        for name, value in response_headers
+                    ],
+                }
+
+            iterable = self.wsgi_application(environ, start_response)
+            try:
+                for chunk in iterable:
+                    if not chunk:
+                        continue
+                    if 'start' in response:
+                        put(response.pop('start'))
+                    put({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+                if 'start' in response:
+                    put(response.pop('start'))
+                put({'type': 'http.response.body'})
+            finally:
+                if hasattr(iterable, 'close'):
+                    iterable.close()
+        finally:
+            put(None)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for executor in (self.read_executor, self.executor):
+                    executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = ThreadPoolWsgiToAsgi(get_wsgi_application())
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 from dotenv import load_dotenv
 
@@ -44,6 +45,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.MetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -74,10 +76,49 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
     }
 }
 
+FILE_CACHE_BACKEND = 'django.core.cache.backends.filebased.FileBasedCache'
+LOCAL_CACHE_BACKENDS = (
+    FILE_CACHE_BACKEND,
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def cache_alias(prefix, location, max_entries, **params):
+    """Кэш из переменных <prefix>_BACKEND, _LOCATION и _MAX_ENTRIES.
+
+    MAX_ENTRIES задается только файловому кэшу и кэшу в памяти: клиенты
+    memcached получают OPTIONS как аргументы и не знают этого ключа.
+    """
+
+    backend = os.getenv(f'{prefix}_BACKEND', default=FILE_CACHE_BACKEND)
+    params['BACKEND'] = backend
+    params['LOCATION'] = os.getenv(f'{prefix}_LOCATION', default=location)
+    if backend in LOCAL_CACHE_BACKENDS:
+        params['OPTIONS'] = {'MAX_ENTRIES': int(
+            os.getenv(f'{prefix}_MAX_ENTRIES', default=max_entries)
+        )}
+    return params
+
+
+# Ключи пользователя (множества избранного и покупок, подписки, список
+# покупок) занимают около четырех записей на активного пользователя.
+# Поколения хранятся отдельно и без срока, чтобы отсев старых записей
+# не сбрасывал ETag и кэш ответов.
+CACHES = {
+    'default': cache_alias('CACHE', '/tmp/foodgram_cache', 20000),
+    'responses': cache_alias(
+        'RESPONSE_CACHE', '/tmp/foodgram_responses', 5000, TIMEOUT=60 * 10
+    ),
+    'generations': cache_alias(
+        'GENERATION_CACHE', '/tmp/foodgram_generations', 100000
+    ),
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -132,6 +173,11 @@ REST_FRAMEWORK = {
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.'
                                 'PageNumberPagination',
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -161,4 +207,46 @@ DJOSER = {
     }
 }
 
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60 * 24
+FOLLOWING_CACHE_TIMEOUT = 60 * 60 * 24
+TAG_MAP_CACHE_TIMEOUT = 60 * 60 * 24
+FEED_AUTHORS_IN_LIST = 500
+
+RESPONSE_CACHE_ENABLED = True
+RECIPE_FAST_SERIALIZER = True
+COMPRESS_MIN_SIZE = 1024
+
+TRENDING_HALF_LIFE = timedelta(days=3)
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_CART_WEIGHT = 0.5
+
+INGREDIENT_SEARCH_IN_MEMORY = True
+INGREDIENT_SEARCH_SIMILARITY = 0.3
+
 SHOPPING_CART_FILE_NAME = 'shopping_list.txt'
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60 * 24
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    default='/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+IMAGE_RENDITIONS = {'thumb': 320, 'card': 640, 'full': 1600}
+IMAGE_RENDITION_FORMATS = ('webp', 'jpeg')
+IMAGE_RENDITIONS_ASYNC = True
+IMAGE_RENDITIONS_WORKERS = 2
+
+IMAGE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40000000
+IMAGE_UPLOAD_SPOOL_SIZE = 1024 * 1024
+RECIPE_JSON_MAX_EXTRA_BYTES = 256 * 1024
+
+METRICS_ENABLED = True
+METRICS_WINDOW = 1000
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_SAMPLE_TTL = 300
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+ASGI_READ_THREADS = int(os.getenv('ASGI_READ_THREADS', default=12))
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', default=4))
+ASGI_BUFFER_SIZE = 1024 * 1024
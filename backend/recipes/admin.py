@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, Tag, TrendingScore)
 
 
 class IngredientInRecipeInline(admin.TabularInline):
@@ -14,17 +14,16 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (IngredientInRecipeInline,)
     list_display = (
         'name',
-        'author'
+        'author',
+        'favorites_count',
+        'in_carts_count'
     )
     list_filter = (
         'author',
         'name',
         'tags'
     )
-    readonly_fields = ('is_favorited',)
-
-    def is_favorited(self, instance):
-        return instance.favorite_recipes.count()
+    readonly_fields = ('favorites_count', 'in_carts_count')
 
 
 @admin.register(Ingredient)
@@ -81,3 +80,15 @@ class FavoriteAdmin(admin.ModelAdmin):
         'user__email',
         'recipe__name'
     )
+
+
+@admin.register(TrendingScore)
+class TrendingScoreAdmin(admin.ModelAdmin):
+    list_display = (
+        'recipe',
+        'score',
+        'stale',
+        'refreshed'
+    )
+    list_select_related = ('recipe',)
+    search_fields = ('recipe__name',)
@@ -0,0 +1,227 @@
+import json
+import os
+
+from api.cache import bump_generation_on_commit
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from users.models import User
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 2000
+
+
+def recipe_to_dict(recipe):
+    return {
+        'author': recipe.author.email,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': recipe.image.name,
+        'pub_date': recipe.pub_date.isoformat(),
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'name': row.ingredient.name,
+                'measurement_unit': row.ingredient.measurement_unit,
+                'amount': row.amount,
+            } for row in recipe.ingredient_in_recipe.all()
+        ],
+    }
+
+
+def export_recipes(batch_size=EXPORT_BATCH_SIZE):
+    """Рецепты строками NDJSON, выбираемые пачками по id.
+
+    Автор, теги и ингредиенты записываются естественными ключами:
+    почтой, слагом и парой (название, единица измерения).
+    """
+
+    last_id = 0
+    while True:
+        recipes = list(
+            Recipe.objects.filter(id__gt=last_id).order_by('id')
+            .select_related('author').prefetch_related(
+                'tags',
+                Prefetch(
+                    'ingredient_in_recipe',
+                    queryset=IngredientInRecipe.objects.select_related(
+                        'ingredient'
+                    )
+                )
+            )[:batch_size]
+        )
+        if not recipes:
+            return
+        for recipe in recipes:
+            yield json.dumps(recipe_to_dict(recipe), ensure_ascii=False) + '\n'
+        last_id = recipes[-1].id
+
+
+def parse_pub_date(value):
+    """Дата публикации из ISO 8601 или None, если ее нет в строке."""
+
+    if value is None:
+        return None
+    pub_date = parse_datetime(value)
+    if pub_date is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date)
+    return pub_date
+
+
+class RecipeImporter:
+    """Загрузка рецептов из строк NDJSON.
+
+    Строки сохраняются пачками по batch_size, каждая пачка в своей
+    транзакции через bulk_create для рецептов, ингредиентов и тегов.
+    После каждой пачки номер последней обработанной строки
+    записывается в файл checkpoint, и загрузку можно продолжить с него.
+    Ошибочные строки пропускаются и попадают в отчет.
+
+    Первичные ключи после bulk_create в Django 2.2 известны только на
+    PostgreSQL, на других СУБД рецепты сохраняются по одному. Дата
+    публикации из файла восстанавливается отдельным bulk_update, так
+    как auto_now_add заменяет ее при создании.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, checkpoint=None):
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.imported = 0
+        self.errors = []
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {}
+        for pk, name, unit in Ingredient.objects.order_by('-id').values_list(
+            'id', 'name', 'measurement_unit'
+        ):
+            self.ingredients[(name, unit)] = pk
+
+    def run(self, lines, start=0):
+        """Загрузить строки после start, вернуть отчет."""
+
+        line_number = start
+        chunk = []
+        for line_number, line in enumerate(lines, 1):
+            if line_number <= start or not line.strip():
+                continue
+            try:
+                chunk.append((line_number, self.parse(line)))
+            except (ValueError, KeyError, TypeError) as error:
+                self.errors.append({'line': line_number, 'error': str(error)})
+            if len(chunk) >= self.batch_size:
+                self.save_chunk(chunk, line_number)
+                chunk = []
+        self.save_chunk(chunk, line_number)
+        return {
+            'lines': line_number,
+            'imported': self.imported,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+        }
+
+    def parse(self, line):
+        data = json.loads(line)
+        cooking_time = int(data['cooking_time'])
+        if cooking_time < 1:
+            raise ValueError('Время приготовления >= 1!')
+        tags = []
+        for slug in data.get('tags', ()):
+            if slug not in self.tags:
+                raise ValueError(f'Неизвестный тег: {slug}')
+            tags.append(self.tags[slug])
+        ingredients = {}
+        for item in data['ingredients']:
+            key = (item['name'], item['measurement_unit'])
+            if key not in self.ingredients:
+                raise ValueError(f'Неизвестный ингредиент: {key[0]}')
+            amount = int(item['amount'])
+            if amount < 1:
+                raise ValueError('Количество ингредиента >= 1!')
+            ingredients[self.ingredients[key]] = amount
+        if not ingredients:
+            raise ValueError('Поле с ингредиентами не может быть пустым')
+        return {
+            'author': data['author'],
+            'name': data['name'],
+            'text': data['text'],
+            'cooking_time': cooking_time,
+            'image': data.get('image', ''),
+            'pub_date': parse_pub_date(data.get('pub_date')),
+            'tags': set(tags),
+            'ingredients': ingredients,
+        }
+
+    def save_chunk(self, chunk, line_number):
+        if not chunk:
+            self.save_checkpoint(line_number)
+            return
+        authors = User.objects.in_bulk(
+            {data['author'] for _, data in chunk}, field_name='email'
+        )
+        rows = []
+        for number, data in chunk:
+            if data['author'] in authors:
+                rows.append(data)
+            else:
+                self.errors.append({
+                    'line': number,
+                    'error': f'Неизвестный автор: {data["author"]}'
+                })
+        with transaction.atomic():
+            recipes = [
+                Recipe(
+                    author=authors[data['author']],
+                    name=data['name'],
+                    text=data['text'],
+                    cooking_time=data['cooking_time'],
+                    image=data['image'],
+                ) for data in rows
+            ]
+            if connection.features.can_return_ids_from_bulk_insert:
+                Recipe.objects.bulk_create(recipes)
+            else:
+                for recipe in recipes:
+                    recipe.save(force_insert=True)
+            dated = []
+            for recipe, data in zip(recipes, rows):
+                if data['pub_date'] is not None:
+                    recipe.pub_date = data['pub_date']
+                    dated.append(recipe)
+            Recipe.objects.bulk_update(dated, ('pub_date',))
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                )
+                for recipe, data in zip(recipes, rows)
+                for ingredient_id, amount in data['ingredients'].items()
+            )
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+                for recipe, data in zip(recipes, rows)
+                for tag_id in data['tags']
+            )
+            bump_generation_on_commit('recipes')
+        self.imported += len(recipes)
+        self.save_checkpoint(line_number)
+
+    def save_checkpoint(self, line_number):
+        if self.checkpoint is None:
+            return
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'w') as file:
+            file.write(str(line_number))
+        os.replace(temporary, self.checkpoint)
+
+
+def read_checkpoint(path):
+    """Номер последней загруженной строки или 0."""
+
+    try:
+        with open(path) as file:
+            return int(file.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,130 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = None
+
+
+def available_formats():
+    return [
+        file_format for file_format in settings.IMAGE_RENDITION_FORMATS
+        if file_format != 'webp' or features.check('webp')
+    ]
+
+
+def rendition_name(image_name, size, file_format):
+    """Путь копии изображения: recipes/renditions/<имя>/<размер>.<формат>."""
+
+    directory, file_name = os.path.split(image_name)
+    stem = os.path.splitext(file_name)[0]
+    return f'{directory}/renditions/{stem}/{size}.{file_format}'
+
+
+def rendition_urls(image_name, formats):
+    """Адреса копий изображения по размерам и форматам."""
+
+    return {
+        size: {
+            file_format: default_storage.url(
+                rendition_name(image_name, size, file_format)
+            )
+            for file_format in formats
+        }
+        for size in settings.IMAGE_RENDITIONS
+    }
+
+
+def make_renditions(image_name):
+    """Сохранить уменьшенные копии изображения во всех форматах.
+
+    Ориентация из EXIF применяется к пикселям, а сами метаданные
+    при перекодировании отбрасываются. Возвращает список форматов.
+    """
+
+    formats = available_formats()
+    with default_storage.open(image_name) as file:
+        image = Image.open(file)
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    for size, max_side in settings.IMAGE_RENDITIONS.items():
+        rendition = image.copy()
+        rendition.thumbnail((max_side, max_side), Image.LANCZOS)
+        for file_format in formats:
+            pil_format, params = FORMATS[file_format]
+            content = io.BytesIO()
+            rendition.save(content, pil_format, **params)
+            name = rendition_name(image_name, size, file_format)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(content.getvalue()))
+    return formats
+
+
+def delete_renditions(image_name, formats):
+    """Удалить копии замененного изображения."""
+
+    for size in settings.IMAGE_RENDITIONS:
+        for file_format in formats:
+            name = rendition_name(image_name, size, file_format)
+            try:
+                default_storage.delete(name)
+            except OSError:
+                logger.exception('Не удалось удалить копию %s', name)
+
+
+def process_recipe_image(recipe_id, image_name):
+    """Создать копии изображения и отметить их у рецепта."""
+
+    from api.cache import bump_generation
+    from recipes.models import Recipe
+
+    try:
+        formats = make_renditions(image_name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', image_name)
+        return False
+    updated = Recipe.objects.filter(
+        pk=recipe_id, image=image_name
+    ).update(renditions=','.join(formats), updated=timezone.now())
+    if updated:
+        bump_generation('recipes')
+    return bool(updated)
+
+
+def _process_in_worker(recipe_id, image_name):
+    try:
+        process_recipe_image(recipe_id, image_name)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', image_name)
+    finally:
+        connections.close_all()
+
+
+def schedule_renditions(recipe):
+    """Обработка изображения рецепта вне запроса после фиксации."""
+
+    global _executor
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    if not settings.IMAGE_RENDITIONS_ASYNC:
+        process_recipe_image(recipe_id, image_name)
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_RENDITIONS_WORKERS,
+            thread_name_prefix='renditions'
+        )
+    _executor.submit(_process_in_worker, recipe_id, image_name)
@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.bulk import EXPORT_BATCH_SIZE, export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Export recipes to an NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', type=str,
+                            help='Output file, stdout by default')
+        parser.add_argument('--batch-size', default=EXPORT_BATCH_SIZE,
+                            type=int, help='Number of recipes per query')
+
+    def handle(self, *args, **options):
+        lines = export_recipes(options['batch_size'])
+        if not options['path']:
+            sys.stdout.writelines(lines)
+            return
+        with open(options['path'], 'w', encoding='utf8') as file:
+            file.writelines(lines)
@@ -0,0 +1,43 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.bulk import IMPORT_BATCH_SIZE, RecipeImporter, read_checkpoint
+
+
+class Command(BaseCommand):
+    help = 'Import recipes from an NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str)
+        parser.add_argument('--batch-size', default=IMPORT_BATCH_SIZE,
+                            type=int, help='Number of recipes per transaction')
+        parser.add_argument('--checkpoint', type=str,
+                            help='Checkpoint file, default <path>.checkpoint')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the checkpoint and start over')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        start = 0 if options['restart'] else read_checkpoint(checkpoint)
+        if start:
+            self.stdout.write(f'Resuming after line {start}')
+        started = time.monotonic()
+        importer = RecipeImporter(options['batch_size'], checkpoint)
+        try:
+            with open(path, encoding='utf8') as file:
+                report = importer.run(file, start)
+        except FileNotFoundError:
+            raise CommandError(f'File {path} not found')
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        for error in report['errors']:
+            self.stderr.write(f'Line {error["line"]}: {error["error"]}')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report["imported"]} recipes, '
+            f'{len(report["errors"])} errors in {elapsed:.2f}s. '
+            f'Run make_renditions to create image copies.'
+        ))
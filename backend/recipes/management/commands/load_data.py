@@ -1,9 +1,15 @@
 import csv
+import io
+import json
 import logging
 import os
+import time
+from itertools import chain, islice
 
+from api.cache import bump_generation
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
 from recipes.models import Ingredient
 
@@ -15,29 +21,183 @@ logging.basicConfig(
 )
 
 DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
+READ_SIZE = 64 * 1024
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if row:
+            name, measurement_unit = row
+            yield name, measurement_unit
+
+
+class JSONArrayReader:
+    """Элементы JSON-массива, прочитанные из файла по частям.
+
+    Ошибка в данных, данные после массива или отсутствие закрывающей
+    скобки вызывают ValueError.
+    """
+
+    decoder = json.JSONDecoder()
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ''
+        self.position = 0
+        self.started = self.closed = False
+
+    def __iter__(self):
+        chunks = iter(lambda: self.file.read(READ_SIZE), '')
+        for chunk in chain(chunks, (None,)):
+            self.buffer = self.buffer[self.position:] + (chunk or '')
+            self.position = 0
+            yield from self.parse(final=chunk is None)
+        if not self.closed:
+            raise ValueError('нет закрывающей скобки массива')
+
+    def skip(self):
+        """Пропустить разделители, вернуть False в конце буфера."""
+
+        separators = ' \t\r\n'
+        if self.started and not self.closed:
+            separators += ','
+        while (self.position < len(self.buffer)
+               and self.buffer[self.position] in separators):
+            self.position += 1
+        return self.position < len(self.buffer)
+
+    def parse(self, final):
+        while self.skip():
+            char = self.buffer[self.position]
+            if self.closed:
+                raise ValueError('данные после конца массива')
+            if not self.started:
+                if char != '[':
+                    raise ValueError('ожидается массив')
+                self.started = True
+                self.position += 1
+                continue
+            if char == ']':
+                self.closed = True
+                self.position += 1
+                continue
+            try:
+                item, self.position = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+            except json.JSONDecodeError as error:
+                if final:
+                    raise ValueError(error)
+                return
+            yield item['name'], item['measurement_unit']
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 class Command(BaseCommand):
-    help = 'Load data from csv file into the database'
+    help = 'Load data from csv or json file into the database'
 
     def add_arguments(self, parser):
         parser.add_argument('filename', default='ingredients.csv', nargs='?',
                             type=str)
+        parser.add_argument('--batch-size', default=1000, type=int,
+                            help='Number of rows per insert')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Roll back instead of saving')
 
     def handle(self, *args, **options):
+        path = os.path.join(DATA_ROOT, options['filename'])
+        reader = JSONArrayReader if path.endswith('.json') else iter_csv
+        started = time.monotonic()
         try:
-            with open(
-                os.path.join(DATA_ROOT, options['filename']),
-                newline='',
-                encoding='utf8'
-            ) as csv_file:
-                data = csv.reader(csv_file)
-                for row in data:
-                    name, measurement_unit = row
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
+            with open(path, newline='', encoding='utf8') as file:
+                with transaction.atomic():
+                    if connection.vendor == 'postgresql':
+                        total, inserted = self.copy(
+                            reader(file), options['batch_size']
+                        )
+                    else:
+                        total, inserted = self.bulk_create(
+                            reader(file), options['batch_size']
+                        )
+                    if options['dry_run']:
+                        transaction.set_rollback(True)
+                    else:
+                        transaction.on_commit(
+                            lambda: bump_generation('ingredients')
+                        )
         except FileNotFoundError:
             raise CommandError('Добавьте файл ingredients в директорию data')
-        logging.info('Successfully loaded all data into database')
+        except (ValueError, KeyError) as error:
+            raise CommandError(f'Неверный формат файла: {error}')
+        elapsed = time.monotonic() - started
+        report = (
+            f'{"Dry run: " if options["dry_run"] else ""}'
+            f'read {total}, inserted {inserted}, '
+            f'skipped {total - inserted} in {elapsed:.2f}s '
+            f'({total / elapsed if elapsed else total:.0f} rows/s)'
+        )
+        self.stdout.write(self.style.SUCCESS(report))
+        logging.info(report)
+
+    def bulk_create(self, rows, batch_size):
+        """Вставка новых строк пачками через bulk_create.
+
+        Уже загруженные пары (название, единица измерения) и повторы
+        внутри файла пропускаются, поэтому повторный запуск ничего
+        не добавляет.
+        """
+
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        total = inserted = 0
+        for chunk in chunked(rows, batch_size):
+            total += len(chunk)
+            new = []
+            for row in chunk:
+                if row not in existing:
+                    existing.add(row)
+                    new.append(Ingredient(
+                        name=row[0], measurement_unit=row[1]
+                    ))
+            Ingredient.objects.bulk_create(new, ignore_conflicts=True)
+            inserted += len(new)
+        return total, inserted
+
+    def copy(self, rows, batch_size):
+        """Загрузка через COPY во временную таблицу на PostgreSQL."""
+
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        total = 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
+            )
+            for chunk in chunked(rows, batch_size):
+                total += len(chunk)
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(chunk)
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import FROM STDIN WITH (FORMAT csv)',
+                    buffer
+                )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT i.name, i.measurement_unit '
+                f'FROM ingredient_import i WHERE NOT EXISTS ('
+                f'SELECT 1 FROM {table} r WHERE r.name = i.name '
+                f'AND r.measurement_unit = i.measurement_unit)'
+            )
+            inserted = cursor.rowcount
+        return total, inserted
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import process_recipe_image
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Create resized copies of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Recreate copies for every recipe')
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(renditions='')
+        processed = failed = 0
+        for recipe_id, image_name in recipes.values_list(
+            'pk', 'image'
+        ).iterator():
+            if process_recipe_image(recipe_id, image_name):
+                processed += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} recipes, failed {failed}'
+        ))
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+def count_subquery(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                recipe=OuterRef('pk')
+            ).values('recipe').annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = 'Recalculate favorites_count and in_carts_count of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', default=1000, type=int,
+                            help='Number of recipes per update')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report recipes with wrong counters')
+
+    def handle(self, *args, **options):
+        drifted = Recipe.objects.annotate(
+            actual_favorites=count_subquery(Favorite),
+            actual_in_carts=count_subquery(ShoppingCart),
+        ).filter(
+            ~Q(favorites_count=F('actual_favorites'))
+            | ~Q(in_carts_count=F('actual_in_carts'))
+        ).order_by().values_list(
+            'pk', 'actual_favorites', 'actual_in_carts'
+        )
+        fixed = 0
+        batch = []
+        with transaction.atomic():
+            for pk, favorites, in_carts in drifted.iterator():
+                batch.append(Recipe(
+                    pk=pk, favorites_count=favorites, in_carts_count=in_carts
+                ))
+                if len(batch) >= options['batch_size']:
+                    fixed += self.save(batch, options['dry_run'])
+                    batch = []
+            fixed += self.save(batch, options['dry_run'])
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(
+            self.style.SUCCESS(f'{verb} {fixed} recipes with wrong counters')
+        )
+
+    def save(self, batch, dry_run):
+        if batch and not dry_run:
+            Recipe.objects.bulk_update(
+                batch, ('favorites_count', 'in_carts_count')
+            )
+        return len(batch)
@@ -0,0 +1,122 @@
+import math
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+
+from api.cache import bump_generation
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.models import Favorite, Recipe, ShoppingCart, TrendingScore
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def decayed_score(events, half_life):
+    """Рейтинг с затуханием, не зависящий от момента расчета.
+
+    Вклад события с весом w в момент t равен w * 2 ** ((t - now) / T).
+    Общий множитель 2 ** (-now / T) не меняет порядок рецептов, поэтому
+    хранится log2(sum(w * 2 ** ((t - EPOCH) / T))): рейтинг
+    пересчитывается только при новых или удаленных событиях.
+    """
+
+    exponents = [
+        math.log2(weight) + (created.timestamp() - EPOCH) / half_life
+        for created, weight in events
+    ]
+    top = max(exponents)
+    return top + math.log2(
+        sum(2 ** (exponent - top) for exponent in exponents)
+    )
+
+
+class Command(BaseCommand):
+    help = ('Recalculate trending scores of recipes. Run periodically, '
+            'e.g. from cron every few minutes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recalculate all recipes')
+        parser.add_argument('--batch-size', default=1000, type=int,
+                            help='Number of recipes per batch')
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        recipes = self.get_recipes(options['full'])
+        updated = removed = 0
+        recipes = iter(recipes)
+        while True:
+            batch = list(islice(recipes, options['batch_size']))
+            if not batch:
+                break
+            with transaction.atomic():
+                batch_updated, batch_removed = self.refresh(batch, started)
+            updated += batch_updated
+            removed += batch_removed
+        bump_generation('trending')
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {updated}, removed {removed} trending scores'
+        ))
+
+    def get_recipes(self, full):
+        """id рецептов, у которых изменились события с прошлого запуска."""
+
+        since = TrendingScore.objects.aggregate(
+            last=Max('refreshed')
+        )['last']
+        if full or since is None:
+            return Recipe.objects.order_by('pk').values_list(
+                'pk', flat=True
+            ).iterator()
+        touched = set(
+            TrendingScore.objects.filter(
+                stale=True
+            ).values_list('recipe_id', flat=True)
+        )
+        for model in (Favorite, ShoppingCart):
+            touched.update(
+                model.objects.filter(
+                    created__gte=since
+                ).values_list('recipe_id', flat=True)
+            )
+        return sorted(touched)
+
+    def refresh(self, recipe_ids, refreshed):
+        half_life = settings.TRENDING_HALF_LIFE.total_seconds()
+        events = defaultdict(list)
+        for model, weight in (
+            (Favorite, settings.TRENDING_FAVORITE_WEIGHT),
+            (ShoppingCart, settings.TRENDING_CART_WEIGHT),
+        ):
+            for recipe_id, created in model.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', 'created'):
+                events[recipe_id].append((created, weight))
+        scores = [
+            TrendingScore(
+                recipe_id=recipe_id,
+                score=decayed_score(recipe_events, half_life),
+                stale=False,
+                refreshed=refreshed
+            )
+            for recipe_id, recipe_events in events.items()
+        ]
+        existing = set(
+            TrendingScore.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True)
+        )
+        removed = existing - set(events)
+        TrendingScore.objects.filter(recipe_id__in=removed).delete()
+        TrendingScore.objects.bulk_update(
+            [score for score in scores if score.recipe_id in existing],
+            ('score', 'stale', 'refreshed')
+        )
+        TrendingScore.objects.bulk_create(
+            [score for score in scores if score.recipe_id not in existing]
+        )
+        return len(scores), len(removed)
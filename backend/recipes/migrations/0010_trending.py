@@ -0,0 +1,61 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name='Дата добавления'
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(
+                auto_now_add=True,
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name='Дата добавления'
+            ),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('recipe', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    primary_key=True,
+                    related_name='trending_score',
+                    serialize=False,
+                    to='recipes.Recipe',
+                    verbose_name='Рецепт'
+                )),
+                ('score', models.FloatField(
+                    db_index=True, verbose_name='Рейтинг'
+                )),
+                ('stale', models.BooleanField(
+                    default=False, verbose_name='Требует пересчета'
+                )),
+                ('refreshed', models.DateTimeField(
+                    verbose_name='Дата пересчета'
+                )),
+            ],
+            options={
+                'verbose_name': 'Рейтинг популярности',
+                'verbose_name_plural': 'Рейтинги популярности',
+            },
+        ),
+    ]
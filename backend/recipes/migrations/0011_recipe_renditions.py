@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_trending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='renditions',
+            field=models.CharField(
+                blank=True,
+                default='',
+                max_length=50,
+                verbose_name='Форматы копий изображения'
+            ),
+        ),
+    ]
@@ -98,11 +98,40 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        db_index=True
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Добавлений в список покупок',
+        default=0
+    )
+    renditions = models.CharField(
+        'Форматы копий изображения',
+        max_length=50,
+        blank=True,
+        default=''
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -154,6 +183,11 @@ class Favorite(models.Model):
         verbose_name='Избранные рецепты',
         help_text='Избранные рецепты у пользователей'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         verbose_name = 'Избранное'
@@ -183,6 +217,11 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         verbose_name='Список покупок'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -196,3 +235,31 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} added {self.recipe} in shopping list'
+
+
+class TrendingScore(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending_score',
+        verbose_name='Рецепт'
+    )
+    score = models.FloatField(
+        'Рейтинг',
+        db_index=True
+    )
+    stale = models.BooleanField(
+        'Требует пересчета',
+        default=False
+    )
+    refreshed = models.DateTimeField(
+        'Дата пересчета'
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг популярности'
+        verbose_name_plural = 'Рейтинги популярности'
+
+    def __str__(self):
+        return f'{self.recipe} - {self.score}'
@@ -1,13 +1,14 @@
 import api.serializers
-from django.db.models import BooleanField, Count, Exists, OuterRef, Value
+from api.metrics import SerializationTimerMixin
 from djoser.serializers import UserSerializer as DjoserUserSerializer
-from recipes.models import Recipe
 from rest_framework import serializers
 
 from users.models import Follow, User
+from users.utils import (annotate_subscriptions, get_recipes_limit,
+                         get_subscriptions)
 
 
-class UserSerializer(DjoserUserSerializer):
+class UserSerializer(SerializationTimerMixin, DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -22,15 +23,12 @@ class UserSerializer(DjoserUserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return Follow.objects.filter(
-            user=request.user, author=obj
-        ).exists()
+        return obj.id in get_subscriptions(self.context.get('request'))
 
 
-class FollowerSerializer(serializers.ModelSerializer):
+class FollowerSerializer(
+    SerializationTimerMixin, serializers.ModelSerializer
+):
 
     class Meta:
         model = Follow
@@ -39,6 +37,10 @@ class FollowerSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = annotate_subscriptions(
+            Follow.objects.filter(pk=instance.pk),
+            get_recipes_limit(request)
+        ).get()
         serializer = FollowSerializer(
             instance,
             context=context
@@ -59,7 +61,9 @@ class FollowerSerializer(serializers.ModelSerializer):
         return data
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(
+    SerializationTimerMixin, serializers.ModelSerializer
+):
     email = serializers.ReadOnlyField(source='author.email')
     id = serializers.ReadOnlyField(source='author.id')
     username = serializers.ReadOnlyField(source='author.username')
@@ -82,39 +86,8 @@ class FollowSerializer(serializers.ModelSerializer):
             'recipes_count'
         )
 
-    def get_is_subscribed(self):
-        qs = User.objects.all()
-        if self.request.user.is_authenticated:
-            qs = qs.annotate(
-                is_subscribed=Exists(
-                    self.request.user.follower.filter(
-                        author=OuterRef('id'),
-                    )).prefetch_related('follower', 'following')
-            )
-        else:
-            qs = qs.annotate(
-                is_subscribed=Value(False, output_field=BooleanField())
-            )
-        return qs
-
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        if request.GET.get('recipe_limit'):
-            recipe_limit = int(request.GET.get('recipe_limit'))
-            queryset = Recipe.objects.filter(
-                author=obj.author)[:recipe_limit]
-        else:
-            queryset = Recipe.objects.filter(
-                author=obj.author)
         serializer = api.serializers.ShortRecipeSerializer(
-            queryset, read_only=True, many=True
+            obj.author.limited_recipes, read_only=True, many=True
         )
         return serializer.data
-
-    def get_recipes_count(self):
-        return self.request.user.follower.select_related(
-            'following'
-        ).prefetch_related(
-            'following__recipe'
-        ).annotate(
-            recipes_count=Count('following__recipe'))
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (BooleanField, Count, OuterRef, Prefetch,
+                              Subquery, Value)
+from recipes.models import Recipe
+from rest_framework.validators import ValidationError
+
+from users.models import Follow
+
+FOLLOWING_KEY = 'following:{}'
+
+
+def get_followed_ids(user_id):
+    """Множество id авторов, на которых подписан пользователь.
+
+    Хранится в общем кэше до изменения подписок пользователя.
+    """
+
+    key = FOLLOWING_KEY.format(user_id)
+    followed = cache.get(key)
+    if followed is None:
+        followed = frozenset(
+            Follow.objects.filter(
+                user_id=user_id
+            ).values_list('author_id', flat=True)
+        )
+        cache.set(key, followed, settings.FOLLOWING_CACHE_TIMEOUT)
+    return followed
+
+
+def invalidate_followed_ids(user_id):
+    """Сбросить кэш подписок после фиксации транзакции."""
+
+    transaction.on_commit(
+        lambda: cache.delete(FOLLOWING_KEY.format(user_id))
+    )
+
+
+def get_subscriptions(request):
+    """Множество id авторов, на которых подписан пользователь запроса.
+
+    Берется из get_followed_ids и запоминается на объекте запроса,
+    поэтому все вложенные сериализаторы пользователей используют его
+    совместно.
+    """
+
+    if request is None or request.user.is_anonymous:
+        return frozenset()
+    subscriptions = getattr(request, '_subscriptions', None)
+    if subscriptions is None:
+        subscriptions = get_followed_ids(request.user.id)
+        request._subscriptions = subscriptions
+    return subscriptions
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit из запроса.
+
+    Параметр recipe_limit принимается как синоним.
+    """
+
+    recipes_limit = request.query_params.get(
+        'recipes_limit', request.query_params.get('recipe_limit')
+    )
+    if recipes_limit is None:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        raise ValidationError(
+            {'recipes_limit': 'Укажите целое неотрицательное число'}
+        )
+    if recipes_limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Укажите целое неотрицательное число'}
+        )
+    return recipes_limit
+
+
+def annotate_subscriptions(queryset, recipes_limit=None):
+    """Подписки с автором, числом рецептов и первыми рецептами автора.
+
+    Все данные для FollowSerializer загружаются тремя запросами
+    независимо от числа подписок: подписки с авторами и счетчиком
+    рецептов, затем по recipes_limit последних рецептов каждого автора.
+    """
+
+    recipes = Recipe.objects.all()
+    if recipes_limit is not None:
+        recipes = recipes.filter(
+            id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:recipes_limit]
+            )
+        )
+    return queryset.select_related('author').annotate(
+        recipes_count=Count('author__recipes'),
+        is_subscribed=Value(True, output_field=BooleanField()),
+    ).prefetch_related(
+        Prefetch(
+            'author__recipes',
+            queryset=recipes,
+            to_attr='limited_recipes'
+        )
+    ).order_by('-id')
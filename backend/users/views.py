@@ -7,6 +7,7 @@ from rest_framework.response import Response
 
 from users.models import Follow, User
 from users.serializers import FollowerSerializer, FollowSerializer
+from users.utils import annotate_subscriptions, get_recipes_limit
 
 
 class FollowViewSet(ListAPIView):
@@ -17,8 +18,10 @@ class FollowViewSet(ListAPIView):
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
-        user = self.request.user
-        return user.follower.all()
+        return annotate_subscriptions(
+            self.request.user.follower.all(),
+            get_recipes_limit(self.request)
+        )
 
 
 class FollowerView(views.APIView):